@@ -1,23 +1,200 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.urls import reverse
+from django.utils.functional import cached_property
 
-from .models import Service, TimeSlot, Booking
+from .models import (
+    AvailabilityException,
+    AvailabilityRule,
+    Booking,
+    Resource,
+    Service,
+    TimeSlot,
+    WaitlistEntry,
+)
 from .services.booking_service import BookingService, BoookingNotCancelableError
+from .services.calendar_feed import CalendarFeedService
 
 # Register your models here.
 
+
+def estimated_count(model, *, using: str) -> int | None:
+    """
+    Conteo aproximado de filas de una tabla sin recorrerla:
+    - PostgreSQL: estadísticas del planner (pg_class.reltuples).
+    - Otros motores (SQLite): MAX(pk), que se resuelve con el índice primario.
+    Devuelve None si el motor no tiene una estimación útil.
+    """
+    connection = connections[using]
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples = -1 si la tabla nunca se ha analizado
+        if row and row[0] >= 0:
+            return row[0]
+        return None
+
+    return model._default_manager.using(using).aggregate(n=Max("pk"))["n"] or 0
+
+
+# Tope del COUNT(*) con filtros: no todos los filtros tienen índice (p. ej. status)
+# y un conteo exacto recorrería la tabla. Más allá del tope no hay páginas.
+FILTERED_COUNT_CAP = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator para changelists con millones de filas.
+    Sin filtros usa el conteo estimado; con filtros cuenta como mucho
+    FILTERED_COUNT_CAP filas (COUNT sobre un LIMIT).
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if getattr(qs, "query", None) is None:
+            return super().count
+
+        if qs.query.where:
+            return qs[:FILTERED_COUNT_CAP].count()
+
+        estimate = estimated_count(qs.model, using=qs.db)
+        if estimate is None:
+            return super().count
+        return estimate
+
+
+class ServiceAutocompleteFilter(admin.SimpleListFilter):
+    """
+    Filtro por servicio con autocompletado (select2 del admin).
+    A diferencia de list_filter = ("service",), no carga todos los servicios:
+    solo consulta el seleccionado y el resto se busca vía ServiceAdmin.search_fields.
+    """
+    title = "servicio"
+    parameter_name = "service"
+    template = "admin/appointments/autocomplete_filter.html"
+
+    # Modelo cuyo FK "service" usa el endpoint de autocompletado del admin
+    source_model = TimeSlot
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.admin_site = model_admin.admin_site
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(service_id=int(value))
+        except (TypeError, ValueError):
+            return queryset.none()
+
+    @cached_property
+    def field(self) -> forms.ModelChoiceField:
+        return forms.ModelChoiceField(
+            queryset=Service.objects.all(),
+            required=False,
+            widget=AutocompleteSelect(
+                self.source_model._meta.get_field("service"),
+                self.admin_site,
+                attrs={"id": f"id_filter_{self.parameter_name}", "style": "width: 100%"},
+            ),
+        )
+
+    def choices(self, changelist):
+        yield {
+            "parameter_name": self.parameter_name,
+            "widget": self.field.widget.render(self.parameter_name, self.value()),
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+class ScalableChangeListMixin:
+    """
+    Ajustes comunes para changelists de tablas grandes (slots y reservas):
+    conteo estimado, sin COUNT(*) adicional del total y filtros por autocompletado.
+
+    Límite conocido: sin año elegido, date_hierarchy calcula MIN/MAX y
+    dates("year") sobre todo el queryset (en reservas, a través del JOIN con
+    el slot). Es una consulta fija pero su costo crece con la tabla; con
+    millones de filas conviene entrar filtrando (servicio o año).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    class Media:
+        css = {"all": ("admin/css/vendor/select2/select2.css", "admin/css/autocomplete.css")}
+        js = (
+            "admin/js/vendor/jquery/jquery.js",
+            "admin/js/vendor/select2/select2.full.js",
+            "admin/js/jquery.init.js",
+            "admin/js/autocomplete.js",
+        )
+
+
+@admin.register(Resource)
+class ResourceAdmin(admin.ModelAdmin):
+    list_display = ("name", "kind", "is_active", "created_at")
+    search_fields = ("name",)
+    list_filter = ("kind", "is_active")
+
+
+class AvailabilityRuleInline(admin.TabularInline):
+    model = AvailabilityRule
+    extra = 0
+
+
+class AvailabilityExceptionInline(admin.TabularInline):
+    model = AvailabilityException
+    extra = 0
+
+
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
-    list_display = ("name", "duration_minutes", "is_active", "created_at")
+    list_display = ("name", "duration_minutes", "availability_mode", "is_active", "created_at")
     search_fields = ("name", )
-    list_filter  = ("is_active",)
+    list_filter  = ("is_active", "availability_mode")
+    autocomplete_fields = ("resources",)
+    inlines = [AvailabilityRuleInline, AvailabilityExceptionInline]
+    readonly_fields = ("calendar_feed_url",)
+
+    @admin.display(description="Feed de calendario (.ics)")
+    def calendar_feed_url(self, obj: Service) -> str:
+        if not obj.pk:
+            return "-"
+        token = CalendarFeedService.token_for_service(obj.pk)
+        return reverse("appointments:service_calendar_feed", kwargs={"token": token})
 
 @admin.register(TimeSlot)
-class TimeSlotAdmin(admin.ModelAdmin):
-    list_display = ("service", "start_at", "status", "created_at")
-    list_filter = ("service", "status")
+class TimeSlotAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ("service_name", "start_at", "status", "created_at")
+    list_filter = (ServiceAutocompleteFilter, "status")
+    list_select_related = ("service",)
     search_fields = ("service__name",)
+    autocomplete_fields = ("service",)
+    date_hierarchy = "start_at"
     ordering = ("start_at",)
 
+    @admin.display(description="Servicio", ordering="service__name")
+    def service_name(self, obj: TimeSlot) -> str:
+        return obj.service.name
+
 @admin.action(description="Cancelar reservas seleccionadas (cambia status a CANCELED)")
 def cancel_bookings(modeladmin, request, queryset):
     ok = 0
@@ -37,9 +214,35 @@ def cancel_bookings(modeladmin, request, queryset):
     if failed:
         modeladmin.message_user(request, f"reservas NO canceladas {failed}, level=message.WARNING")
 
+
+class BookingServiceFilter(ServiceAutocompleteFilter):
+    source_model = Booking
+
+
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
-    list_display = ("id", "customer_name", "customer_email", "service", "slot", "status", "created_at")
-    list_filter = ("service", "status")
+class BookingAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ("id", "customer_name", "customer_email", "service_name", "slot_start_at", "status", "created_at")
+    list_filter = (BookingServiceFilter, "status")
+    list_select_related = ("service", "slot")
     search_fields = ("customer_name", "customer_email", "service__name")
+    autocomplete_fields = ("service", "slot")
+    date_hierarchy = "slot__start_at"
     actions = [cancel_bookings]
+
+    @admin.display(description="Servicio", ordering="service__name")
+    def service_name(self, obj: Booking) -> str:
+        return obj.service.name
+
+    @admin.display(description="Horario", ordering="slot__start_at")
+    def slot_start_at(self, obj: Booking):
+        return obj.slot.start_at
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ("id", "customer_name", "customer_email", "slot", "status", "created_at", "promoted_at")
+    list_filter = ("status",)
+    list_select_related = ("slot", "slot__service")
+    search_fields = ("customer_name", "customer_email")
+    autocomplete_fields = ("slot",)
+    raw_id_fields = ("booking",)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class AppointmentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.appointments"
+
+    def ready(self):
+        from apps.appointments import checks  # noqa: F401
+        # Invalidación del registro de servicios (ver services/service_registry.py)
+        from apps.appointments import signals  # noqa: F401
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Backends que no comparten datos entre procesos
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Las versiones de los feeds .ics y del registro de servicios viven en la
+    caché por defecto y se renuevan solo en el worker que confirma el cambio.
+    Con una caché local por proceso, los demás workers seguirían sirviendo
+    la versión vieja (p. ej. aceptando reservas de un servicio desactivado).
+    """
+    if not getattr(settings, "REQUIRE_SHARED_CACHE", False):
+        return []
+
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+
+    return [
+        Error(
+            f"La caché por defecto ({backend}) no se comparte entre workers.",
+            hint=(
+                "Configura CACHE_URL con una caché compartida (p. ej. redis://...), "
+                "o REQUIRE_SHARED_CACHE=False si corre un único proceso."
+            ),
+            id="appointments.E001",
+        )
+    ]
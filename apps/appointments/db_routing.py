@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DB_ALIAS = "replica"
+
+# Cookie que "pega" al cliente a la primaria tras escribir (read-your-writes)
+PIN_COOKIE_NAME = "agendalite_primary_until"
+
+
+@dataclass
+class _RequestRouting:
+    use_replica: bool = False
+    wrote: bool = False
+
+
+# Estado por request. Fuera de un request (comandos, shell, tests) no hay
+# estado y todo va a la primaria.
+_routing: ContextVar[_RequestRouting | None] = ContextVar("appointments_db_routing", default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """
+    Lecturas a la réplica solo si:
+    - hay réplica configurada,
+    - la vista lo pidió (ReplicaReadMixin) y el cliente no está pegado a la primaria,
+    - no hubo escrituras en este request y no estamos dentro de una transacción
+      (BookingService corre en transaction.atomic: lee y escribe en la primaria).
+    Todas las escrituras van a la primaria.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if not replica_configured() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambas bases tienen los mismos datos (la réplica es una copia)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Marca una vista de solo lectura: sus consultas pueden ir a la réplica.
+    """
+    use_replica = True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Activa las lecturas en réplica para vistas marcadas con ReplicaReadMixin
+    y, si el request escribió algo, pega al cliente a la primaria durante
+    REPLICA_PIN_SECONDS para que vea su propia reserva aunque la réplica vaya atrasada.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestRouting()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if state.wrote:
+            pin_seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                str(time.time() + pin_seconds),
+                max_age=pin_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        view_class = getattr(view_func, "view_class", None)
+
+        if (
+            state is not None
+            and getattr(view_class, "use_replica", False)
+            and request.method in ("GET", "HEAD")
+            and not self._is_pinned(request)
+        ):
+            state.use_replica = True
+        return None
+
+    @staticmethod
+    def _is_pinned(request) -> bool:
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
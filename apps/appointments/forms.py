@@ -4,6 +4,7 @@ from django import forms
 from django.utils import timezone
 
 from apps.appointments.models import TimeSlot, Booking
+from apps.appointments.services.service_registry import ServiceRegistry
 
 class BookingRequestForm(forms.Form):
     """
@@ -20,6 +21,9 @@ class BookingRequestForm(forms.Form):
         label="Correo",
         widget=forms.EmailInput(attrs={"class": "input", "placeholder": "tu@correo.com"}),
     )
+    # Token de idempotencia generado al mostrar el form: los reenvíos del
+    # mismo POST devuelven la reserva original (ver BookingCreateView)
+    idempotency_key = forms.CharField(required=False, max_length=64, widget=forms.HiddenInput)
 
     def __init__(self, *args, slot: TimeSlot, **kwargs):
         super().__init__(*args, **kwargs)
@@ -34,12 +38,48 @@ class BookingRequestForm(forms.Form):
         if self.slot.status != TimeSlot.Status.AVAILABLE:
             raise forms.ValidationError("este slot ya no esta disponible.")
 
-        if not self.slot.service.can_be_booked():
+        if not ServiceRegistry.get(self.slot.service_id).can_be_booked():
             raise forms.ValidationError("ESte servicio no esta disponible")
 
         return cleaned
 
 
+class WaitlistRequestForm(forms.Form):
+    """
+    Solicitud para entrar a la lista de espera de un slot lleno.
+    Nota: NO crea la entrada directamente. Eso lo hace WaitlistService.
+    """
+
+    customer_name = forms.CharField(
+        max_length=120,
+        label="Nombre",
+        widget=forms.TextInput(attrs={"class": "input", "placeholder": "Tu nombre"}),
+    )
+    customer_email = forms.EmailField(
+        label="Correo",
+        widget=forms.EmailInput(attrs={"class": "input", "placeholder": "tu@correo.com"}),
+    )
+
+    def __init__(self, *args, slot: TimeSlot, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slot = slot
+
+    def clean(self):
+        cleaned = super().clean()
+
+        if self.slot.start_at < timezone.now():
+            raise forms.ValidationError("Este slot ya paso, elige uno diferente.")
+
+        if self.slot.status == TimeSlot.Status.AVAILABLE:
+            raise forms.ValidationError("Este slot está disponible, puedes reservarlo directamente.")
+
+        # Sin reserva confirmada no hay nada que cancelar: nadie saldría de la cola
+        if self.slot.status != TimeSlot.Status.BOOKED or not self.slot.has_confirmed_booking():
+            raise forms.ValidationError("Este slot no admite lista de espera.")
+
+        return cleaned
+
+
 class MyBookingsFilterForm(forms.Form):
     """
     Form de filtros por GET para /my-bookings/.
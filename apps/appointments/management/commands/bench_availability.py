@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time as time_module
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.appointments.models import AvailabilityException, AvailabilityRule, Service, TimeSlot
+from apps.appointments.services.availability import AvailabilityService
+from apps.appointments.services.booking_service import BookingService
+
+
+# Horario de ejemplo: lunes a viernes de 9 a 17
+OPEN_WEEKDAYS = range(5)
+OPEN_FROM = time(9)
+OPEN_UNTIL = time(17)
+
+
+def _table_bytes(*models) -> int | None:
+    """
+    Bytes ocupados por las tablas (con sus índices) de los modelos dados.
+    None si el motor no expone el dato (SQLite sin dbstat).
+    """
+    tables = [m._meta.db_table for m in models]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT COALESCE(SUM(pg_total_relation_size(t::regclass)), 0) FROM unnest(%s::text[]) AS t",
+                [tables],
+            )
+            return cursor.fetchone()[0]
+
+        if connection.vendor == "sqlite":
+            placeholders = ", ".join(["%s"] * len(tables))
+            try:
+                cursor.execute(
+                    "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                    f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders}))",
+                    tables,
+                )
+            except Exception:  # noqa: BLE001 - SQLite compilado sin dbstat
+                return None
+            return cursor.fetchone()[0]
+
+    return None
+
+
+def _fmt_bytes(value: int | None) -> str:
+    if value is None:
+        return "n/d"
+    if value < 1024 * 1024:
+        return f"{value / 1024:.1f} KiB"
+    return f"{value / 1024 / 1024:.1f} MiB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara disponibilidad materializada (un TimeSlot por horario) contra reglas "
+        "semanales (horarios virtuales): almacenamiento, latencia de listar los próximos "
+        "20 horarios y latencia de reservar. Todo dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=1_000)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--slot-minutes", type=int, default=30)
+        parser.add_argument("--samples", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            base = timezone.localdate() + timedelta(days=1)
+            stamp = int(time_module.time())
+
+            storage_before = (_table_bytes(TimeSlot), _table_bytes(AvailabilityRule, AvailabilityException))
+
+            materialized, rows = self._seed_materialized(
+                services=options["services"], days=options["days"], minutes=options["slot_minutes"],
+                base=base, stamp=stamp,
+            )
+            rules, rule_rows = self._seed_rules(
+                services=options["services"], minutes=options["slot_minutes"], base=base, stamp=stamp,
+            )
+
+            storage_after = (_table_bytes(TimeSlot), _table_bytes(AvailabilityRule, AvailabilityException))
+
+            self.stdout.write(
+                f"servicios={options['services']} días={options['days']} "
+                f"granularidad={options['slot_minutes']}min"
+            )
+            self.stdout.write(
+                f"{'materializado':<14} filas={rows:>10} "
+                f"espacio={_fmt_bytes(self._delta(storage_before[0], storage_after[0]))}"
+            )
+            self.stdout.write(
+                f"{'reglas':<14} filas={rule_rows:>10} "
+                f"espacio={_fmt_bytes(self._delta(storage_before[1], storage_after[1]))}"
+            )
+
+            samples = options["samples"]
+            self._bench_listing(rng.sample(materialized, min(samples, len(materialized))), rules_mode=False)
+            self._bench_listing(rng.sample(rules, min(samples, len(rules))), rules_mode=True)
+            self._bench_booking(rng.sample(materialized, min(samples, len(materialized))), rules_mode=False)
+            self._bench_booking(rng.sample(rules, min(samples, len(rules))), rules_mode=True)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado (datos revertidos)."))
+
+    @staticmethod
+    def _delta(before: int | None, after: int | None) -> int | None:
+        if before is None or after is None:
+            return None
+        return after - before
+
+    def _open_starts(self, day, minutes: int):
+        tz = timezone.get_current_timezone()
+        start_at = timezone.make_aware(datetime.combine(day, OPEN_FROM), tz)
+        end_at = timezone.make_aware(datetime.combine(day, OPEN_UNTIL), tz)
+        step = timedelta(minutes=minutes)
+        while start_at + step <= end_at:
+            yield start_at
+            start_at += step
+
+    def _seed_materialized(self, *, services: int, days: int, minutes: int, base, stamp: int):
+        Service.objects.bulk_create(
+            [
+                Service(name=f"bench-mat-{stamp}-{i}", duration_minutes=minutes)
+                for i in range(services)
+            ]
+        )
+        created = list(Service.objects.filter(name__startswith=f"bench-mat-{stamp}-"))
+
+        days_open = [
+            base + timedelta(days=d) for d in range(days) if (base + timedelta(days=d)).weekday() in OPEN_WEEKDAYS
+        ]
+
+        rows = 0
+        for service in created:
+            batch = [
+                TimeSlot(service=service, start_at=start_at)
+                for day in days_open
+                for start_at in self._open_starts(day, minutes)
+            ]
+            TimeSlot.objects.bulk_create(batch, batch_size=2000)
+            rows += len(batch)
+        return created, rows
+
+    def _seed_rules(self, *, services: int, minutes: int, base, stamp: int):
+        Service.objects.bulk_create(
+            [
+                Service(
+                    name=f"bench-rules-{stamp}-{i}",
+                    duration_minutes=minutes,
+                    availability_mode=Service.AvailabilityMode.RULES,
+                )
+                for i in range(services)
+            ]
+        )
+        created = list(Service.objects.filter(name__startswith=f"bench-rules-{stamp}-"))
+
+        rules = [
+            AvailabilityRule(service=service, weekday=weekday, start_time=OPEN_FROM, end_time=OPEN_UNTIL)
+            for service in created
+            for weekday in OPEN_WEEKDAYS
+        ]
+        AvailabilityRule.objects.bulk_create(rules, batch_size=2000)
+
+        # Un feriado por servicio, para que las excepciones también cuenten
+        tz = timezone.get_current_timezone()
+        holiday = base + timedelta(days=30)
+        exceptions = [
+            AvailabilityException(
+                service=service,
+                starts_at=timezone.make_aware(datetime.combine(holiday, time.min), tz),
+                ends_at=timezone.make_aware(datetime.combine(holiday + timedelta(days=1), time.min), tz),
+                reason="Feriado",
+            )
+            for service in created
+        ]
+        AvailabilityException.objects.bulk_create(exceptions, batch_size=2000)
+        return created, len(rules) + len(exceptions)
+
+    def _report(self, label: str, latencies: list[float]) -> None:
+        ordered = sorted(latencies)
+        p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f"{label:<34} n={len(ordered)} p50={statistics.median(ordered) * 1000:.2f}ms p95={p95 * 1000:.2f}ms"
+        )
+
+    def _bench_listing(self, services: list[Service], *, rules_mode: bool) -> None:
+        latencies = []
+        for service in services:
+            started = time_module.perf_counter()
+            if rules_mode:
+                slots = list(islice(AvailabilityService.iter_free_slots(service), 20))
+            else:
+                slots = list(TimeSlot.objects.for_service(service.id).available()[:20])
+            latencies.append(time_module.perf_counter() - started)
+            assert len(slots) == 20, "el benchmark necesita al menos 20 horarios por servicio"
+
+        self._report(f"listar 20 ({'reglas' if rules_mode else 'materializado'})", latencies)
+
+    def _bench_booking(self, services: list[Service], *, rules_mode: bool) -> None:
+        latencies = []
+        for n, service in enumerate(services):
+            kwargs = {
+                "service_id": service.id,
+                "customer_name": "bench",
+                "customer_email": f"bench-{n}@example.com",
+            }
+            if rules_mode:
+                kwargs["start_at"] = next(AvailabilityService.iter_free_slots(service))
+            else:
+                kwargs["slot_id"] = TimeSlot.objects.for_service(service.id).available().values_list("id", flat=True)[0]
+
+            started = time_module.perf_counter()
+            BookingService.create_booking(**kwargs)
+            latencies.append(time_module.perf_counter() - started)
+
+        self._report(f"reservar ({'reglas' if rules_mode else 'materializado'})", latencies)
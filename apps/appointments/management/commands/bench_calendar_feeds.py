@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from apps.appointments.models import Booking, Service, TimeSlot
+from apps.appointments.services.calendar_feed import KIND_CUSTOMER, KIND_SERVICE, CalendarFeedService
+from apps.appointments.views import CustomerCalendarFeedView, ServiceCalendarFeedView
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de los feeds .ics: N suscriptores hacen polling (frío, caché y 304). "
+        "Los datos se crean dentro de una transacción que se revierte al final "
+        "y sus claves se borran de la caché."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=10_000)
+        parser.add_argument("--services", type=int, default=10)
+        parser.add_argument("--bookings-per-subscriber", type=int, default=2)
+
+    def handle(self, *args, **options):
+        self.feeds: list[tuple[str, object]] = []
+        try:
+            with transaction.atomic():
+                tokens = self._seed(
+                    subscribers=options["subscribers"],
+                    services=options["services"],
+                    per_subscriber=options["bookings_per_subscriber"],
+                )
+                self._run(tokens)
+                transaction.set_rollback(True)
+        finally:
+            # Versiones y cuerpos de filas que ya no existen
+            for kind, value in self.feeds:
+                CalendarFeedService.forget(kind, value)
+
+    def _seed(self, *, subscribers: int, services: int, per_subscriber: int) -> list[tuple[type, str]]:
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        stamp = int(time.time())
+
+        created_services = [
+            Service.objects.create(name=f"bench-ics-{stamp}-{i}", duration_minutes=30)
+            for i in range(services)
+        ]
+
+        slots = []
+        for n in range(subscribers * per_subscriber):
+            slots.append(
+                TimeSlot(
+                    service=created_services[n % services],
+                    start_at=now + timedelta(hours=1 + n // services),
+                    status=TimeSlot.Status.BOOKED,
+                )
+            )
+        TimeSlot.objects.bulk_create(slots, batch_size=1000)
+        slots = list(
+            TimeSlot.objects.filter(service__in=created_services).order_by("id").only("id", "service_id")
+        )
+
+        bookings = [
+            Booking(
+                service_id=slot.service_id,
+                slot_id=slot.id,
+                customer_name=f"Cliente {n % subscribers}",
+                customer_email=f"bench-{n % subscribers}@example.com",
+            )
+            for n, slot in enumerate(slots)
+        ]
+        Booking.objects.bulk_create(bookings, batch_size=1000)
+
+        # Los datos se insertaron sin pasar por BookingService: invalidamos a mano
+        # (en SQLite los ids se reutilizan tras el rollback de una corrida anterior)
+        for booking in bookings[:subscribers]:
+            CalendarFeedService.invalidate(service_id=booking.service_id, customer_email=booking.customer_email)
+
+        self.feeds = [(KIND_SERVICE, s.id) for s in created_services]
+        self.feeds += [(KIND_CUSTOMER, f"bench-{n}@example.com") for n in range(subscribers)]
+
+        tokens = [
+            (ServiceCalendarFeedView, CalendarFeedService.token_for_service(s.id)) for s in created_services
+        ]
+        tokens += [
+            (CustomerCalendarFeedView, CalendarFeedService.token_for_customer(f"bench-{n}@example.com"))
+            for n in range(subscribers)
+        ]
+        return tokens
+
+    def _run(self, tokens: list[tuple[type, str]]) -> None:
+        factory = RequestFactory()
+        views = {
+            ServiceCalendarFeedView: ServiceCalendarFeedView.as_view(),
+            CustomerCalendarFeedView: CustomerCalendarFeedView.as_view(),
+        }
+        etags: dict[str, str] = {}
+
+        def poll(conditional: bool):
+            statuses: dict[int, int] = {}
+            for view_class, token in tokens:
+                headers = {"HTTP_IF_NONE_MATCH": etags[token]} if conditional else {}
+                response = views[view_class](factory.get("/", **headers), token=token)
+                # Consumimos el cuerpo como lo haría el servidor WSGI
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                else:
+                    response.content
+                etags[token] = response.headers["ETag"]
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            return statuses
+
+        for label, conditional in (
+            ("frío (genera y cachea)", False),
+            ("caché (cuerpo cacheado)", False),
+            ("condicional (If-None-Match)", True),
+        ):
+            counter = _QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                statuses = poll(conditional)
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label:<30} feeds={len(tokens)} tiempo={elapsed:.2f}s "
+                f"({elapsed / len(tokens) * 1000:.3f} ms/feed) queries={counter.count} status={statuses}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado (datos revertidos)."))
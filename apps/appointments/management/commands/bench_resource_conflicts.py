@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.appointments.models import Booking, Resource, ResourceAllocation, Service, TimeSlot
+from apps.appointments.services.resource_scheduler import ResourceScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark del chequeo de solapes de recursos sobre un calendario con N intervalos. "
+        "Compara la búsqueda del intervalo anterior (índice) con la consulta de solape directa. "
+        "Los datos se crean dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervals", type=int, default=100_000)
+        parser.add_argument("--checks", type=int, default=2_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            resource, base, step = self._seed(options["intervals"])
+            self._run(resource, base, step, intervals=options["intervals"], checks=options["checks"], seed=options["seed"])
+            transaction.set_rollback(True)
+
+    def _seed(self, intervals: int):
+        stamp = int(time.time())
+        resource = Resource.objects.create(name=f"bench-resource-{stamp}")
+        service = Service.objects.create(name=f"bench-resource-service-{stamp}", duration_minutes=30)
+        duration = service.duration()
+
+        # Intervalos de 30 min cada 45 min: hay huecos libres y horarios ocupados
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        step = timedelta(minutes=45)
+
+        TimeSlot.objects.bulk_create(
+            [
+                TimeSlot(service=service, start_at=base + i * step, status=TimeSlot.Status.BOOKED)
+                for i in range(intervals)
+            ],
+            batch_size=1000,
+        )
+        slots = TimeSlot.objects.filter(service=service).order_by("start_at").only("id", "start_at")
+
+        bookings = Booking.objects.bulk_create(
+            [
+                Booking(service=service, slot=slot, customer_name="bench", customer_email="bench@example.com")
+                for slot in slots.iterator(chunk_size=2000)
+            ],
+            batch_size=1000,
+        )
+        ResourceAllocation.objects.bulk_create(
+            [
+                ResourceAllocation(
+                    resource=resource,
+                    booking=booking,
+                    start_at=booking.slot.start_at,
+                    end_at=booking.slot.start_at + duration,
+                )
+                for booking in bookings
+            ],
+            batch_size=1000,
+        )
+        return resource, base, step
+
+    def _run(self, resource: Resource, base, step, *, intervals: int, checks: int, seed: int) -> None:
+        rng = random.Random(seed)
+        # Sondas de 15 min: con offset 30 caen justo en el hueco libre
+        duration = timedelta(minutes=15)
+        probes = []
+        for _ in range(checks):
+            start_at = base + rng.randrange(intervals) * step + timedelta(minutes=rng.choice((0, 15, 30, 40)))
+            probes.append((start_at, start_at + duration))
+
+        def indexed(start_at, end_at):
+            return ResourceScheduler.find_conflict(resource_id=resource.id, start_at=start_at, end_at=end_at) is not None
+
+        def naive(start_at, end_at):
+            return ResourceAllocation.objects.filter(
+                resource_id=resource.id, start_at__lt=end_at, end_at__gt=start_at
+            ).exists()
+
+        results = {}
+        for label, check in (("intervalo anterior (índice)", indexed), ("solape directo", naive)):
+            started = time.perf_counter()
+            results[label] = [check(*probe) for probe in probes]
+            elapsed = time.perf_counter() - started
+            conflicts = sum(results[label])
+            self.stdout.write(
+                f"{label:<30} intervalos={intervals} chequeos={checks} "
+                f"tiempo={elapsed:.2f}s ({elapsed / checks * 1000:.3f} ms/chequeo) conflictos={conflicts}"
+            )
+
+        if len(set(map(tuple, results.values()))) != 1:
+            self.stderr.write(self.style.ERROR("Los dos métodos no coinciden."))
+            return
+
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado (datos revertidos)."))
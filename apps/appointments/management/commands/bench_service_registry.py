@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.appointments.forms import BookingRequestForm
+from apps.appointments.models import Resource, Service, TimeSlot
+from apps.appointments.services.booking_service import BookingService
+from apps.appointments.services.service_registry import ServiceRegistry
+
+
+class Command(BaseCommand):
+    help = (
+        "Consultas y latencia por reserva (cargar slot + validar form + crear reserva) "
+        "con el registro de servicios en memoria y con el registro desactivado "
+        "(cada lectura de Service va a la BD). Todo dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=200)
+        parser.add_argument("--bookings", type=int, default=500, help="Reservas por escenario")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            slot_ids = self._seed(services=options["services"], bookings=options["bookings"] * 2)
+            half = len(slot_ids) // 2
+
+            ServiceRegistry.invalidate()
+            ServiceRegistry.get(TimeSlot.objects.get(id=slot_ids[0]).service_id)  # carga inicial
+
+            self._run("registro en memoria", slot_ids[:half])
+            with ServiceRegistry.bypassed():
+                self._run("registro desactivado", slot_ids[half:])
+
+            transaction.set_rollback(True)
+
+        # El registro vio servicios que ya no existen
+        ServiceRegistry.invalidate()
+        self.stdout.write(self.style.SUCCESS("Benchmark terminado (datos revertidos)."))
+
+    def _seed(self, *, services: int, bookings: int) -> list[int]:
+        stamp = int(time.time())
+        resource = Resource.objects.create(name=f"bench-registry-{stamp}")
+
+        Service.objects.bulk_create(
+            [Service(name=f"bench-registry-{stamp}-{i}", duration_minutes=30) for i in range(services)]
+        )
+        created = list(Service.objects.filter(name__startswith=f"bench-registry-{stamp}-"))
+        Service.resources.through.objects.bulk_create(
+            [Service.resources.through(service_id=s.id, resource_id=resource.id) for s in created]
+        )
+
+        # Cada reserva ocupa el recurso compartido: horarios distintos para no chocar
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        TimeSlot.objects.bulk_create(
+            [
+                TimeSlot(service=created[n % len(created)], start_at=base + timedelta(hours=n))
+                for n in range(bookings)
+            ],
+            batch_size=2000,
+        )
+        return list(
+            TimeSlot.objects.filter(service__in=created).order_by("start_at").values_list("id", flat=True)
+        )
+
+    def _book(self, slot_id: int, n: int) -> None:
+        # Lo mismo que hace BookingCreateView en un POST
+        slot = TimeSlot.objects.get(id=slot_id)
+        form = BookingRequestForm(
+            {"customer_name": "bench", "customer_email": f"bench-{n}@example.com"}, slot=slot
+        )
+        assert form.is_valid(), form.errors
+        BookingService.create_booking(
+            service_id=slot.service_id,
+            slot_id=slot.id,
+            customer_name=form.cleaned_data["customer_name"],
+            customer_email=form.cleaned_data["customer_email"],
+        )
+
+    def _run(self, label: str, slot_ids: list[int]) -> None:
+        service_table = Service._meta.db_table
+        queries = []
+        service_queries = []
+        latencies = []
+        tables = Counter()
+
+        for n, slot_id in enumerate(slot_ids):
+            # El log de consultas tiene tope (9000): lo vaciamos en cada reserva
+            reset_queries()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                self._book(slot_id, n)
+                latencies.append(time.perf_counter() - started)
+
+            sqls = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+            queries.append(len(sqls))
+            service_queries.append(sum(1 for sql in sqls if f'FROM "{service_table}"' in sql or f'"{service_table}_resources"' in sql))
+            tables.update(sql.split(" ")[0] for sql in sqls)
+
+        ordered = sorted(latencies)
+        p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f"{label:<22} reservas={len(slot_ids)} consultas/reserva={statistics.mean(queries):.2f} "
+            f"(Service: {statistics.mean(service_queries):.2f}) "
+            f"p50={statistics.median(ordered) * 1000:.2f}ms p95={p95 * 1000:.2f}ms "
+            f"[{', '.join(f'{k}={v / len(slot_ids):.1f}' for k, v in sorted(tables.items()))}]"
+        )
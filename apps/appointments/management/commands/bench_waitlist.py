@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.appointments.models import Booking, Service, TimeSlot, WaitlistEntry
+from apps.appointments.services.booking_service import BookingService
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de la lista de espera: slots llenos con colas profundas y "
+        "cancelaciones concurrentes que promueven la cabeza de cada cola. "
+        "Los hilos usan conexiones propias, así que los datos se confirman y se borran al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--slots", type=int, default=200)
+        parser.add_argument("--depth", type=int, default=1_000, help="Entradas en espera por slot")
+        parser.add_argument("--rounds", type=int, default=5, help="Cancelaciones sucesivas por slot")
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, **options):
+        service = self._seed(slots=options["slots"], depth=options["depth"])
+        try:
+            self._run(service, rounds=options["rounds"], threads=options["threads"], depth=options["depth"])
+        finally:
+            self._cleanup(service)
+
+    def _seed(self, *, slots: int, depth: int) -> Service:
+        service = Service.objects.create(name=f"bench-waitlist-{int(time.time())}", duration_minutes=30)
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        TimeSlot.objects.bulk_create(
+            [
+                TimeSlot(service=service, start_at=base + timedelta(hours=i), status=TimeSlot.Status.BOOKED)
+                for i in range(slots)
+            ],
+            batch_size=1000,
+        )
+        slot_ids = list(TimeSlot.objects.filter(service=service).values_list("id", flat=True))
+
+        Booking.objects.bulk_create(
+            [
+                Booking(service=service, slot_id=slot_id, customer_name="bench", customer_email="holder@example.com")
+                for slot_id in slot_ids
+            ],
+            batch_size=1000,
+        )
+
+        entries = (
+            WaitlistEntry(
+                slot_id=slot_id,
+                customer_name=f"espera {n}",
+                customer_email=f"wait-{n}@example.com",
+            )
+            for slot_id in slot_ids
+            for n in range(depth)
+        )
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) == 5000:
+                WaitlistEntry.objects.bulk_create(batch)
+                batch = []
+        WaitlistEntry.objects.bulk_create(batch)
+
+        return service
+
+    def _run(self, service: Service, *, rounds: int, threads: int, depth: int) -> None:
+        latencies: list[float] = []
+        errors: list[str] = []
+        lock = threading.Lock()
+
+        def worker(booking_ids: list[int]):
+            try:
+                for booking_id in booking_ids:
+                    started = time.perf_counter()
+                    try:
+                        BookingService.cancel_booking(booking_id=booking_id)
+                    except Exception as e:  # noqa: BLE001 - el benchmark reporta y sigue
+                        with lock:
+                            errors.append(f"{type(e).__name__}: {e}")
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            booking_ids = list(
+                Booking.objects.filter(service=service, status=Booking.Status.CONFIRMED).values_list("id", flat=True)
+            )
+            chunks = [booking_ids[i::threads] for i in range(threads)]
+            pool = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+        elapsed = time.perf_counter() - started
+
+        if latencies:
+            ordered = sorted(latencies)
+            p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+            self.stdout.write(
+                f"profundidad={depth} hilos={threads} cancelaciones={len(latencies)} tiempo={elapsed:.2f}s "
+                f"p50={statistics.median(ordered) * 1000:.2f}ms p95={p95 * 1000:.2f}ms errores={len(errors)}"
+            )
+        for error in errors[:5]:
+            self.stderr.write(error)
+
+        self._verify(service, rounds=min(rounds, depth))
+
+    def _verify(self, service: Service, *, rounds: int) -> None:
+        """
+        Invariantes: una sola reserva confirmada por slot, y los promovidos son
+        exactamente las primeras `rounds` entradas de cada cola (FIFO).
+        """
+        slots = TimeSlot.objects.filter(service=service)
+        confirmed_per_slot = set(
+            Booking.objects.filter(slot__in=slots, status=Booking.Status.CONFIRMED)
+            .values_list("slot_id", flat=True)
+        )
+        ok = len(confirmed_per_slot) == slots.count()
+
+        for slot_id in slots.values_list("id", flat=True):
+            expected = list(
+                WaitlistEntry.objects.filter(slot_id=slot_id).order_by("created_at", "id").values_list("id", flat=True)[:rounds]
+            )
+            promoted = list(
+                WaitlistEntry.objects.filter(slot_id=slot_id, status=WaitlistEntry.Status.PROMOTED)
+                .order_by("created_at", "id")
+                .values_list("id", flat=True)
+            )
+            if promoted != expected:
+                ok = False
+                break
+
+        if ok:
+            self.stdout.write(self.style.SUCCESS("Invariantes OK (FIFO y una reserva confirmada por slot)."))
+        else:
+            self.stderr.write(self.style.ERROR("Invariantes rotas."))
+
+    def _cleanup(self, service: Service) -> None:
+        slots = TimeSlot.objects.filter(service=service)
+        WaitlistEntry.objects.filter(slot__in=slots).delete()
+        Booking.objects.filter(service=service).delete()
+        slots.delete()
+        service.delete()
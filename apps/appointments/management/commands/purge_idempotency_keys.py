@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from apps.appointments.services.idempotency import IdempotencyService
+
+
+class Command(BaseCommand):
+    help = "Borra las claves de idempotencia vencidas (pensado para un cron diario)."
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyService.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Claves vencidas borradas: {deleted}"))
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer_email'], name='booking_customer_email_idx'),
+        ),
+    ]
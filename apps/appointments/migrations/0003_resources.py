@@ -0,0 +1,66 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Solo PostgreSQL: el motor garantiza que un recurso no tenga dos asignaciones
+# solapadas (gist sobre resource_id + tstzrange). En SQLite el chequeo lo hace
+# ResourceScheduler usando el índice (resource, start_at).
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        "ALTER TABLE appointments_resourceallocation "
+        "ADD CONSTRAINT alloc_no_overlap_per_resource "
+        "EXCLUDE USING gist (resource_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&)"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "ALTER TABLE appointments_resourceallocation DROP CONSTRAINT IF EXISTS alloc_no_overlap_per_resource"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_booking_customer_email_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Resource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120, unique=True)),
+                ('kind', models.CharField(choices=[('STAFF', 'Profesional'), ('ROOM', 'Sala')], default='STAFF', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='resources',
+            field=models.ManyToManyField(blank=True, related_name='services', to='appointments.resource'),
+        ),
+        migrations.CreateModel(
+            name='ResourceAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='appointments.booking')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='allocations', to='appointments.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resource', 'start_at'], name='alloc_resource_start_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_at__gt', models.F('start_at'))), name='alloc_end_after_start')],
+            },
+        ),
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_resources'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_name', models.CharField(max_length=120)),
+                ('customer_email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('WAITING', 'En espera'), ('PROMOTED', 'Promovida a reserva'), ('CANCELED', 'Cancelada')], default='WAITING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='appointments.timeslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'CONFIRMED')), fields=('slot',), name='uniq_confirmed_booking_per_slot'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='booking',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='appointments.booking'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='appointments.timeslot'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['slot', 'status', 'created_at', 'id'], name='waitlist_dequeue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'WAITING')), fields=('slot', 'customer_email'), name='uniq_waiting_email_per_slot'),
+        ),
+    ]
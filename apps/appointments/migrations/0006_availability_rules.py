@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='availability_mode',
+            field=models.CharField(choices=[('MATERIALIZED', 'Slots pre-creados'), ('RULES', 'Reglas semanales')], default='MATERIALIZED', max_length=12),
+        ),
+        migrations.CreateModel(
+            name='AvailabilityException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('reason', models.CharField(blank=True, max_length=120)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_exceptions', to='appointments.service')),
+            ],
+            options={
+                'ordering': ['starts_at'],
+                'indexes': [models.Index(fields=['service', 'starts_at'], name='avail_exc_service_start_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to='appointments.service')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='rule_end_after_start')],
+            },
+        ),
+    ]
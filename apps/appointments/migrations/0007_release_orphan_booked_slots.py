@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def release_orphan_booked_slots(apps, schema_editor):
+    """
+    Antes de 0004 cancelar una reserva dejaba el slot BOOKED (OneToOne): quedan
+    slots BOOKED sin ninguna reserva confirmada. Con lista de espera, esos
+    slots aceptarían entradas que nunca se promoverían.
+    """
+    TimeSlot = apps.get_model("appointments", "TimeSlot")
+    Booking = apps.get_model("appointments", "Booking")
+
+    confirmed = Booking.objects.filter(status="CONFIRMED").values("slot_id")
+    TimeSlot.objects.filter(status="BOOKED").exclude(id__in=confirmed).update(status="AVAILABLE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_availability_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_orphan_booked_slots, migrations.RunPython.noop),
+    ]
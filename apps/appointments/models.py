@@ -1,16 +1,47 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 
 
+class Resource(models.Model):
+    """
+    Recurso compartido entre servicios (profesional o sala).
+    Un recurso no puede estar en dos reservas que se solapen en el tiempo.
+    """
+    class Kind(models.TextChoices):
+        STAFF = "STAFF", "Profesional"
+        ROOM = "ROOM", "Sala"
+
+    name = models.CharField(max_length=120, unique=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices, default=Kind.STAFF)
+    is_active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.get_kind_display()})"
+
+
 class Service(models.Model):
     """
     Servicio que se puede agendar.
     """
+    class AvailabilityMode(models.TextChoices):
+        # Un TimeSlot por horario, creado de antemano (seed_agenda, admin)
+        MATERIALIZED = "MATERIALIZED", "Slots pre-creados"
+        # Horarios calculados desde AvailabilityRule; el TimeSlot se crea al reservar
+        RULES = "RULES", "Reglas semanales"
+
     name = models.CharField(max_length=120, unique=True)
     duration_minutes = models.PositiveIntegerField(default=30)
     is_active = models.BooleanField(default=True)
+    resources = models.ManyToManyField(Resource, blank=True, related_name="services")
+    availability_mode = models.CharField(
+        max_length=12, choices=AvailabilityMode.choices, default=AvailabilityMode.MATERIALIZED
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -18,10 +49,90 @@ class Service(models.Model):
     def can_be_booked(self) -> bool:
         return self.is_active
 
+    def duration(self) -> timedelta:
+        return timedelta(minutes=self.duration_minutes)
+
+    def uses_rules(self) -> bool:
+        return self.availability_mode == self.AvailabilityMode.RULES
+
     def __str__(self) -> str:
         return f"{self.name} ({self.duration_minutes} min)"
 
 
+def _service_name(obj: models.Model) -> str:
+    """
+    Nombre del servicio para __str__ sin una consulta por fila: usa el
+    Service ya cargado (select_related) o, si no, el registro en memoria.
+    """
+    if obj._meta.get_field("service").is_cached(obj):
+        return obj.service.name
+    from apps.appointments.services.service_registry import ServiceRegistry  # evita import circular
+    return ServiceRegistry.get(obj.service_id).name
+
+
+class AvailabilityRule(models.Model):
+    """
+    Horario semanal de un servicio en modo RULES: cada `weekday` entre
+    start_time y end_time hay un horario cada `duration_minutes` del servicio.
+    Las horas se interpretan en la zona horaria del proyecto.
+    """
+    class Weekday(models.IntegerChoices):
+        MONDAY = 0, "Lunes"
+        TUESDAY = 1, "Martes"
+        WEDNESDAY = 2, "Miércoles"
+        THURSDAY = 3, "Jueves"
+        FRIDAY = 4, "Viernes"
+        SATURDAY = 5, "Sábado"
+        SUNDAY = 6, "Domingo"
+
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="availability_rules")
+    weekday = models.PositiveSmallIntegerField(choices=Weekday.choices)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["weekday", "start_time"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_time__gt=models.F("start_time")),
+                name="rule_end_after_start",
+            ),
+        ]
+
+    def applies_on(self, day) -> bool:
+        if self.valid_from and day < self.valid_from:
+            return False
+        if self.valid_until and day > self.valid_until:
+            return False
+        return day.weekday() == self.weekday
+
+    def __str__(self) -> str:
+        return f"{_service_name(self)}: {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class AvailabilityException(models.Model):
+    """
+    Bloqueo puntual (feriado, vacaciones) sobre las reglas de un servicio.
+    Ningún horario que se solape con [starts_at, ends_at) se ofrece.
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="availability_exceptions")
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    reason = models.CharField(max_length=120, blank=True)
+
+    class Meta:
+        ordering = ["starts_at"]
+        indexes = [
+            models.Index(fields=["service", "starts_at"], name="avail_exc_service_start_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{_service_name(self)}: {self.starts_at:%Y-%m-%d %H:%M} - {self.ends_at:%Y-%m-%d %H:%M}"
+
+
 class TimeSlotQuerySet(models.QuerySet):
     """
     QuerySet con intención de negocio: 'disponibles', 'futuros', etc.
@@ -71,6 +182,9 @@ class TimeSlot(models.Model):
     def is_available(self) -> bool:
         return self.is_in_future() and self.status == self.Status.AVAILABLE
 
+    def has_confirmed_booking(self) -> bool:
+        return self.bookings.filter(status=Booking.Status.CONFIRMED).exists()
+
     def mark_booked(self) -> None:
         self.status = self.Status.BOOKED
 
@@ -78,7 +192,7 @@ class TimeSlot(models.Model):
         self.status = self.Status.AVAILABLE
 
     def __str__(self) -> str:
-        return f"{self.service.name} @ {self.start_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
+        return f"{_service_name(self)} @ {self.start_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
 
 
 class BookingQuerySet(models.QuerySet):
@@ -98,7 +212,8 @@ class Booking(models.Model):
         CANCELED = "CANCELED", "Cancelada"
 
     service = models.ForeignKey(Service, on_delete=models.PROTECT, related_name="bookings")
-    slot = models.OneToOneField(TimeSlot, on_delete=models.PROTECT, related_name="booking")
+    # Un slot puede acumular reservas canceladas, pero solo una confirmada
+    slot = models.ForeignKey(TimeSlot, on_delete=models.PROTECT, related_name="bookings")
 
     customer_name = models.CharField(max_length=120)
     customer_email = models.EmailField()
@@ -108,9 +223,137 @@ class Booking(models.Model):
 
     objects = BookingQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            # Feeds .ics y /my-bookings/ filtran por correo
+            models.Index(fields=["customer_email"], name="booking_customer_email_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["slot"],
+                condition=models.Q(status="CONFIRMED"),
+                name="uniq_confirmed_booking_per_slot",
+            ),
+        ]
+
     def cancel(self) -> None:
         self.status = self.Status.CANCELED
 
     def __str__(self) -> str:
-        return f"{self.customer_name} - {self.service.name} @ {self.slot.start_at:%Y-%m-%d %H:%M}"
+        return f"{self.customer_name} - {_service_name(self)} @ {self.slot.start_at:%Y-%m-%d %H:%M}"
+
+
+
+class WaitlistEntryQuerySet(models.QuerySet):
+    def waiting(self):
+        return self.filter(status=WaitlistEntry.Status.WAITING)
+
+    def queue_for(self, slot_id: int):
+        """
+        Cola FIFO de un slot. Con el índice (slot, status, created_at, id)
+        tomar la cabeza es O(log n) sin importar lo larga que sea la cola.
+        """
+        return self.waiting().filter(slot_id=slot_id).order_by("created_at", "id")
+
+
+class WaitlistEntry(models.Model):
+    """
+    Cliente esperando que se libere un slot lleno (servicio + horario).
+    Al cancelarse la reserva del slot, BookingService promueve la cabeza
+    de la cola a una reserva confirmada en la misma transacción.
+    """
+    class Status(models.TextChoices):
+        WAITING = "WAITING", "En espera"
+        PROMOTED = "PROMOTED", "Promovida a reserva"
+        CANCELED = "CANCELED", "Cancelada"
+
+    slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name="waitlist")
+    customer_name = models.CharField(max_length=120)
+    customer_email = models.EmailField()
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.WAITING)
+    booking = models.OneToOneField(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="waitlist_entry"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = WaitlistEntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["slot", "status", "created_at", "id"], name="waitlist_dequeue_idx"),
+        ]
+        constraints = [
+            # Un mismo correo no puede esperar dos veces el mismo slot
+            models.UniqueConstraint(
+                fields=["slot", "customer_email"],
+                condition=models.Q(status="WAITING"),
+                name="uniq_waiting_email_per_slot",
+            ),
+        ]
+
+    def promote(self, booking: Booking) -> None:
+        self.status = self.Status.PROMOTED
+        self.booking = booking
+        self.promoted_at = timezone.now()
+
+    def __str__(self) -> str:
+        return f"{self.customer_name} en espera de slot {self.slot_id} ({self.get_status_display()})"
 
+
+class ResourceAllocation(models.Model):
+    """
+    Intervalo [start_at, end_at) en que una reserva ocupa un recurso.
+    - PostgreSQL: una restricción de exclusión (gist) impide solapes.
+    - SQLite: el índice (resource, start_at) permite chequear solapes
+      mirando solo el intervalo anterior (ver ResourceScheduler).
+    Se borra al cancelar la reserva, liberando el recurso.
+    """
+    resource = models.ForeignKey(Resource, on_delete=models.PROTECT, related_name="allocations")
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="allocations")
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["resource", "start_at"], name="alloc_resource_start_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_at__gt=models.F("start_at")),
+                name="alloc_end_after_start",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.resource.name}: {self.start_at:%Y-%m-%d %H:%M} - {self.end_at:%H:%M}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Resultado de una operación ya ejecutada, por clave de idempotencia.
+    Se inserta en la misma transacción que la operación: si la clave existe,
+    la operación terminó y los reintentos devuelven el mismo resultado.
+    """
+    scope = models.CharField(max_length=40)
+    key = models.CharField(max_length=64)
+    # Hash de los datos de la petición: la misma clave con otros datos es un error del cliente
+    fingerprint = models.CharField(max_length=64)
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="uniq_idempotency_scope_key"),
+        ]
+
+    def is_expired(self) -> bool:
+        return self.expires_at <= timezone.now()
+
+    def __str__(self) -> str:
+        return f"{self.scope}:{self.key}"
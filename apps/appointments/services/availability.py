@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from django.utils import timezone
+
+from apps.appointments.models import AvailabilityException, AvailabilityRule, Service, TimeSlot
+from apps.appointments.services.service_registry import ServiceSnapshot
+
+
+# Hasta dónde buscamos horarios libres (evita generar para siempre si no hay reglas)
+AVAILABILITY_HORIZON_DAYS = 365
+
+# Los horarios se calculan por ventanas: 2 consultas por ventana (bloqueos y ocupados)
+WINDOW_DAYS = 7
+
+
+class AvailabilityService:
+    """
+    Horarios "virtuales" de servicios en modo RULES.
+
+    En vez de pre-crear un TimeSlot por horario, se calculan con generadores
+    a partir de AvailabilityRule, descontando AvailabilityException y los
+    TimeSlot ya ocupados. El TimeSlot real solo se inserta al reservar
+    (BookingService.create_booking con start_at).
+    """
+
+    @staticmethod
+    def _rules_by_weekday(service: Service | ServiceSnapshot) -> dict[int, list[AvailabilityRule]]:
+        rules = defaultdict(list)
+        for rule in AvailabilityRule.objects.filter(service_id=service.id):
+            rules[rule.weekday].append(rule)
+        return rules
+
+    @staticmethod
+    def _iter_day(rules_by_weekday: dict[int, list[AvailabilityRule]], day: date, step: timedelta) -> Iterator[datetime]:
+        tz = timezone.get_current_timezone()
+        for rule in rules_by_weekday.get(day.weekday(), ()):
+            if not rule.applies_on(day):
+                continue
+            start_at = timezone.make_aware(datetime.combine(day, rule.start_time), tz)
+            end_at = timezone.make_aware(datetime.combine(day, rule.end_time), tz)
+            while start_at + step <= end_at:
+                yield start_at
+                start_at += step
+
+    @staticmethod
+    def _iter_starts(rules_by_weekday, step: timedelta, *, start: datetime, end: datetime) -> Iterator[datetime]:
+        day = timezone.localtime(start).date()
+        last_day = timezone.localtime(end).date()
+        while day <= last_day:
+            for start_at in AvailabilityService._iter_day(rules_by_weekday, day, step):
+                if start <= start_at < end:
+                    yield start_at
+            day += timedelta(days=1)
+
+    @staticmethod
+    def iter_free_slots(service: Service | ServiceSnapshot, *, start: datetime | None = None, days: int = AVAILABILITY_HORIZON_DAYS) -> Iterator[datetime]:
+        """
+        Horarios libres desde `start` (por defecto, ahora), en orden.
+        Es perezoso: consumir los primeros 20 solo consulta la primera ventana.
+        """
+        rules_by_weekday = AvailabilityService._rules_by_weekday(service)
+        if not rules_by_weekday:
+            return
+
+        start = start or timezone.now()
+        horizon = start + timedelta(days=days)
+        step = service.duration()
+
+        window_start = start
+        while window_start < horizon:
+            window_end = min(window_start + timedelta(days=WINDOW_DAYS), horizon)
+
+            starts = list(
+                AvailabilityService._iter_starts(rules_by_weekday, step, start=window_start, end=window_end)
+            )
+            if starts:
+                blocked = list(
+                    AvailabilityException.objects
+                    .filter(service_id=service.id, starts_at__lt=window_end + step, ends_at__gt=window_start)
+                    .values_list("starts_at", "ends_at")
+                )
+                taken = set(
+                    TimeSlot.objects
+                    .for_service(service.id)
+                    .filter(start_at__gte=window_start, start_at__lt=window_end)
+                    .exclude(status=TimeSlot.Status.AVAILABLE)
+                    .values_list("start_at", flat=True)
+                )
+
+                for start_at in starts:
+                    if start_at in taken:
+                        continue
+                    end_at = start_at + step
+                    if any(b_start < end_at and b_end > start_at for b_start, b_end in blocked):
+                        continue
+                    yield start_at
+
+            window_start = window_end
+
+    @staticmethod
+    def is_offered(service: Service | ServiceSnapshot, start_at: datetime) -> bool:
+        """
+        True si start_at es un horario de las reglas y no cae en un bloqueo.
+        (Si ya está reservado lo decide BookingService con el estado del TimeSlot.)
+        """
+        if not service.uses_rules():
+            return False
+
+        day = timezone.localtime(start_at).date()
+        rules_by_weekday = AvailabilityService._rules_by_weekday(service)
+        if start_at not in set(AvailabilityService._iter_day(rules_by_weekday, day, service.duration())):
+            return False
+
+        return not AvailabilityException.objects.filter(
+            service_id=service.id,
+            starts_at__lt=start_at + service.duration(),
+            ends_at__gt=start_at,
+        ).exists()
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 
 from django.db import transaction
 from django.utils import timezone
 
-from apps.appointments.models import Booking, Service, TimeSlot
+from apps.appointments.models import Booking, TimeSlot
+from apps.appointments.services.availability import AvailabilityService
+from apps.appointments.services.calendar_feed import CalendarFeedService
+from apps.appointments.services.idempotency import SCOPE_BOOKING_CREATE, IdempotencyService
+from apps.appointments.services.resource_scheduler import ResourceConflictError, ResourceScheduler
+from apps.appointments.services.service_registry import ServiceRegistry, ServiceSnapshot
+from apps.appointments.services.waitlist_service import WaitlistService
 
 
 class SlotNotAvailableError(Exception):
@@ -23,6 +30,8 @@ class BoookingNotCancelableError(Exception):
 class CreateBookingResult:
     booking: Booking
     slot: TimeSlot
+    # True si es la respuesta guardada de un envío anterior con la misma clave
+    replayed: bool = False
 
 
 class BookingService:
@@ -33,15 +42,30 @@ class BookingService:
 
     @staticmethod
     @transaction.atomic
-    def create_booking(*, service_id: int, slot_id: int, customer_name: str, customer_email: str) -> CreateBookingResult:
-        service = Service.objects.get(id=service_id)
+    def create_booking(
+        *,
+        service_id: int,
+        customer_name: str,
+        customer_email: str,
+        slot_id: int | None = None,
+        start_at: datetime | None = None,
+    ) -> CreateBookingResult:
+        """
+        Reserva un slot existente (slot_id) o, en servicios con reglas de
+        disponibilidad, un horario virtual (start_at) cuyo TimeSlot se crea aquí.
+        """
+        # Sin consulta: el servicio sale del registro en memoria del proceso
+        service = ServiceRegistry.get(service_id)
 
         if not service.can_be_booked():
             raise ServiceNotBookableError("El servicio no está disponible para reservas.")
 
-        # Nota: En PostgreSQL, aquí usaríamos select_for_update() para evitar doble reserva real.
-        # En SQLite, el patrón se mantiene para el curso, aunque el locking es más limitado.
-        slot = TimeSlot.objects.select_related("service").get(id=slot_id)
+        if slot_id is None:
+            slot = BookingService._claim_virtual_slot(service=service, start_at=start_at)
+        else:
+            # Nota: En PostgreSQL, aquí usaríamos select_for_update() para evitar doble reserva real.
+            # En SQLite, el patrón se mantiene para el curso, aunque el locking es más limitado.
+            slot = TimeSlot.objects.get(id=slot_id)
 
         if slot.service_id != service.id:
             raise SlotNotAvailableError("El slot no pertenece al servicio indicado.")
@@ -52,28 +76,155 @@ class BookingService:
         if slot.status != TimeSlot.Status.AVAILABLE:
             raise SlotNotAvailableError("Este slot ya no está disponible.")
 
+        booking = BookingService._book_slot(
+            service=service,
+            slot=slot,
+            customer_name=customer_name,
+            customer_email=customer_email,
+        )
+
+        return CreateBookingResult(booking=booking, slot=slot)
+
+    @staticmethod
+    def _claim_virtual_slot(*, service: ServiceSnapshot, start_at: datetime | None) -> TimeSlot:
+        """
+        Materializa el TimeSlot de un horario virtual. La restricción
+        uniq_service_start_at hace que dos reservas concurrentes del mismo
+        horario terminen en la misma fila (y la segunda vea el slot BOOKED).
+        """
+        if start_at is None:
+            raise SlotNotAvailableError("Debes indicar un slot o un horario.")
+
+        if not AvailabilityService.is_offered(service, start_at):
+            raise SlotNotAvailableError("Este horario no está disponible.")
+
+        slot, _ = TimeSlot.objects.get_or_create(
+            service_id=service.id,
+            start_at=start_at,
+            defaults={"status": TimeSlot.Status.AVAILABLE},
+        )
+        return slot
+
+    @staticmethod
+    @transaction.atomic
+    def create_booking_idempotent(
+        *,
+        idempotency_key: str,
+        service_id: int,
+        customer_name: str,
+        customer_email: str,
+        slot_id: int | None = None,
+        start_at: datetime | None = None,
+    ) -> CreateBookingResult:
+        """
+        create_booking() protegido por clave de idempotencia: un reintento
+        (o un duplicado concurrente) devuelve la reserva original en vez de
+        fallar con SlotNotAvailableError. Si create_booking falla, la clave
+        se revierte con la transacción y el cliente puede reintentar.
+        """
+        record, created = IdempotencyService.claim(
+            scope=SCOPE_BOOKING_CREATE,
+            key=idempotency_key,
+            fingerprint=IdempotencyService.booking_fingerprint(
+                customer_email=customer_email, slot_id=slot_id, service_id=service_id, start_at=start_at
+            ),
+        )
+        if not created:
+            return CreateBookingResult(booking=record.booking, slot=record.booking.slot, replayed=True)
+
+        result = BookingService.create_booking(
+            service_id=service_id,
+            slot_id=slot_id,
+            start_at=start_at,
+            customer_name=customer_name,
+            customer_email=customer_email,
+        )
+
+        record.booking = result.booking
+        record.save(update_fields=["booking"])
+        return result
+
+    @staticmethod
+    def _book_slot(*, service: ServiceSnapshot, slot: TimeSlot, customer_name: str, customer_email: str) -> Booking:
+        """
+        Ocupa el slot y sus recursos. Las validaciones de negocio las hace el
+        llamador (create_booking o la promoción desde la lista de espera).
+        """
         slot.mark_booked()
         slot.save(update_fields=["status"])
 
         booking = Booking.objects.create(
-            service=service,
+            service_id=service.id,
             slot=slot,
             customer_name=customer_name,
             customer_email=customer_email,
             status=Booking.Status.CONFIRMED,
         )
 
-        return CreateBookingResult(booking=booking, slot=slot)
+        # Servicios que comparten profesional/sala no pueden solaparse en el tiempo
+        try:
+            ResourceScheduler.allocate(
+                booking=booking,
+                resource_ids=service.resource_ids,
+                start_at=slot.start_at,
+                end_at=slot.start_at + service.duration(),
+            )
+        except ResourceConflictError as e:
+            raise SlotNotAvailableError(str(e)) from e
+
+        # Los feeds .ics cambian solo si la transacción se confirma
+        transaction.on_commit(
+            lambda: CalendarFeedService.invalidate(service_id=service.id, customer_email=customer_email)
+        )
+
+        return booking
+
+    @staticmethod
+    def _promote_waitlist(*, slot: TimeSlot, service: ServiceSnapshot) -> Booking | None:
+        """
+        Convierte la cabeza de la lista de espera del slot en reserva confirmada.
+        Si no se puede (servicio inactivo, recurso ocupado) el slot queda
+        disponible y la entrada sigue en espera.
+        """
+        if not service.can_be_booked():
+            return None
+
+        entry = WaitlistService.pop_head(slot_id=slot.id)
+        if entry is None:
+            return None
+
+        try:
+            with transaction.atomic():
+                booking = BookingService._book_slot(
+                    service=service,
+                    slot=slot,
+                    customer_name=entry.customer_name,
+                    customer_email=entry.customer_email,
+                )
+        except SlotNotAvailableError:
+            slot.mark_available()
+            return None
+
+        entry.promote(booking)
+        entry.save(update_fields=["status", "booking", "promoted_at"])
+        return booking
 
     @staticmethod
     @transaction.atomic
     def cancel_booking(*, booking_id: int) -> Booking:
         """
-        Cancelación MVP:
-        - Booking pasa a CANCELED
-        - Slot se mantiene BOOKED (por modelado OneToOne actual)
+        Cancelación:
+        - Booking pasa a CANCELED y libera sus recursos
+        - Si hay lista de espera, la cabeza se promueve a reserva en esta misma transacción
+        - Si no, el slot vuelve a AVAILABLE
         """
-        booking = Booking.objects.select_related("slot", "service").get(id=booking_id)
+        # Bloqueamos reserva y slot (no el servicio: no serializamos cancelaciones ajenas)
+        booking = (
+            Booking.objects
+            .select_for_update(of=("self", "slot"))
+            .select_related("slot")
+            .get(id=booking_id)
+        )
 
         if booking.status == Booking.Status.CANCELED:
             raise BoookingNotCancelableError("La reserva ya esta cancelada")
@@ -86,6 +237,20 @@ class BookingService:
         booking.cancel()
         booking.save(update_fields=["status"])
 
+        # Liberamos profesional/sala para otros servicios
+        ResourceScheduler.release(booking=booking)
+
+        slot = booking.slot
+        if BookingService._promote_waitlist(slot=slot, service=ServiceRegistry.get(booking.service_id)) is None:
+            slot.mark_available()
+            slot.save(update_fields=["status"])
+
+        transaction.on_commit(
+            lambda: CalendarFeedService.invalidate(
+                service_id=booking.service_id, customer_email=booking.customer_email
+            )
+        )
+
         return booking
 
 
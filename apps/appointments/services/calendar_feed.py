@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterator
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.appointments.models import Booking
+
+
+# Ventana hacia atrás que incluimos en los feeds (el futuro va completo)
+FEED_PAST_DAYS = 30
+
+# Cuánto vive en caché el cuerpo de un feed para una versión dada.
+# Al cambiar la versión la clave cambia, así que esto solo limpia basura.
+FEED_BODY_TIMEOUT = 60 * 60 * 24
+
+# Cuánto vive la versión de un feed sin cambios. Es una red de seguridad:
+# si una invalidación no llega a un worker, la versión vieja expira igual.
+FEED_VERSION_TIMEOUT = 60 * 10
+
+# Sugerencia de refresco para los clientes de calendario (Cache-Control max-age)
+FEED_MAX_AGE = 60 * 5
+
+TOKEN_SALT = "appointments.calendar_feed"
+
+KIND_SERVICE = "service"
+KIND_CUSTOMER = "customer"
+
+
+class InvalidFeedTokenError(Exception):
+    pass
+
+
+def _normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def _email_key(email: str) -> str:
+    # Las claves de caché no deben llevar el correo en claro (ni caracteres raros)
+    return hashlib.sha256(_normalize_email(email).encode()).hexdigest()[:32]
+
+
+def _next_version(previous: float | None) -> float:
+    """
+    Versión nueva de un feed. Last-Modified tiene resolución de segundos
+    (se redondea hacia arriba), así que la versión nueva debe caer en un
+    segundo posterior al de la anterior: si no, un cliente que solo envía
+    If-Modified-Since recibiría un 304 tras dos cambios en el mismo segundo.
+    """
+    now = time.time()
+    if previous is None or now >= math.ceil(previous):
+        return now
+    return math.ceil(previous) + max(now % 1, 0.000001)
+
+
+def _ics_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_datetime(value: datetime) -> str:
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_line(line: str) -> str:
+    """
+    RFC 5545: líneas de máximo 75 octetos, continuadas con CRLF + espacio.
+    """
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    current = ""
+    limit = 75
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = char
+            limit = 74  # el espacio inicial de la continuación cuenta
+        else:
+            current += char
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+class CalendarFeedService:
+    """
+    Feeds iCalendar (.ics) por servicio y por cliente.
+
+    Los clientes de calendario hacen polling agresivo, así que:
+    - Cada feed tiene una "versión" en caché (timestamp del último cambio).
+      BookingService la renueva al crear/cancelar reservas.
+    - La versión sirve de ETag / Last-Modified: un 304 no toca la BD.
+    - El cuerpo se genera como stream y se guarda en caché bajo su versión.
+    """
+
+    # --- Tokens firmados ---
+
+    @staticmethod
+    def token_for_service(service_id: int) -> str:
+        return signing.dumps({"k": KIND_SERVICE, "id": service_id}, salt=TOKEN_SALT, compress=True)
+
+    @staticmethod
+    def token_for_customer(customer_email: str) -> str:
+        return signing.dumps(
+            {"k": KIND_CUSTOMER, "email": _normalize_email(customer_email)},
+            salt=TOKEN_SALT,
+            compress=True,
+        )
+
+    @staticmethod
+    def service_id_from_token(token: str) -> int:
+        data = CalendarFeedService._load_token(token, KIND_SERVICE)
+        return int(data["id"])
+
+    @staticmethod
+    def customer_email_from_token(token: str) -> str:
+        data = CalendarFeedService._load_token(token, KIND_CUSTOMER)
+        return data["email"]
+
+    @staticmethod
+    def _load_token(token: str, kind: str) -> dict:
+        try:
+            data = signing.loads(token, salt=TOKEN_SALT)
+        except signing.BadSignature:
+            raise InvalidFeedTokenError("Token de calendario inválido.")
+
+        if not isinstance(data, dict) or data.get("k") != kind:
+            raise InvalidFeedTokenError("Token de calendario inválido.")
+        return data
+
+    # --- Versionado ---
+
+    @staticmethod
+    def _version_key(kind: str, ident: str) -> str:
+        return f"appointments:ics:version:{kind}:{ident}"
+
+    @staticmethod
+    def _ident(kind: str, value) -> str:
+        return _email_key(value) if kind == KIND_CUSTOMER else str(value)
+
+    @staticmethod
+    def get_version(kind: str, value) -> float:
+        key = CalendarFeedService._version_key(kind, CalendarFeedService._ident(kind, value))
+        version = cache.get(key)
+        if version is None:
+            # Sin versión conocida (caché vacía): arrancamos una nueva.
+            # add() evita pisar la de otro worker que llegó primero; si la
+            # caché no la guarda (DummyCache, expulsión) usamos la local.
+            version = time.time()
+            if not cache.add(key, version, timeout=FEED_VERSION_TIMEOUT):
+                version = cache.get(key, version)
+        return version
+
+    @staticmethod
+    def invalidate(*, service_id: int, customer_email: str) -> None:
+        """
+        Renueva la versión de los feeds afectados por un cambio en una reserva.
+        """
+        keys = [
+            CalendarFeedService._version_key(KIND_SERVICE, str(service_id)),
+            CalendarFeedService._version_key(KIND_CUSTOMER, _email_key(customer_email)),
+        ]
+        previous = cache.get_many(keys)
+        cache.set_many(
+            {key: _next_version(previous.get(key)) for key in keys},
+            timeout=FEED_VERSION_TIMEOUT,
+        )
+
+    @staticmethod
+    def forget(kind: str, value) -> None:
+        """
+        Borra la versión y el cuerpo cacheado de un feed (p. ej. datos de un
+        benchmark que se revirtieron y no deben quedar en la caché).
+        """
+        key = CalendarFeedService._version_key(kind, CalendarFeedService._ident(kind, value))
+        version = cache.get(key)
+        keys = [key]
+        if version is not None:
+            keys.append(CalendarFeedService._body_key(kind, value, version))
+        cache.delete_many(keys)
+
+    @staticmethod
+    def last_modified(version: float) -> int:
+        # Hacia arriba: un segundo truncado quedaría antes de la versión
+        return math.ceil(version)
+
+    @staticmethod
+    def etag(kind: str, value, version: float) -> str:
+        return f'"{kind}-{CalendarFeedService._ident(kind, value)}-{version:.6f}"'
+
+    # --- Generación ---
+
+    @staticmethod
+    def cached_body(kind: str, value, version: float) -> bytes | None:
+        return cache.get(CalendarFeedService._body_key(kind, value, version))
+
+    @staticmethod
+    def _body_key(kind: str, value, version: float) -> str:
+        return f"appointments:ics:body:{kind}:{CalendarFeedService._ident(kind, value)}:{version:.6f}"
+
+    @staticmethod
+    def stream(kind: str, value, version: float) -> Iterator[bytes]:
+        """
+        Genera el feed por partes y, si se consume completo, lo deja en caché
+        bajo la versión leída al empezar (si cambió mientras tanto, la
+        siguiente petición verá la versión nueva y no usará este cuerpo).
+        """
+        chunks: list[bytes] = []
+
+        for chunk in CalendarFeedService._render(kind, value):
+            data = chunk.encode("utf-8")
+            chunks.append(data)
+            yield data
+
+        cache.set(
+            CalendarFeedService._body_key(kind, value, version),
+            b"".join(chunks),
+            timeout=FEED_BODY_TIMEOUT,
+        )
+
+    @staticmethod
+    def _bookings(kind: str, value):
+        since = timezone.now() - timedelta(days=FEED_PAST_DAYS)
+        qs = Booking.objects.filter(slot__start_at__gte=since)
+
+        if kind == KIND_SERVICE:
+            # La agenda del servicio solo muestra lo que ocupa horario
+            qs = qs.filter(service_id=value, status=Booking.Status.CONFIRMED)
+        else:
+            qs = qs.filter(customer_email=_normalize_email(value))
+
+        return (
+            qs.select_related("service", "slot")
+            .only(
+                "id", "status", "customer_name", "created_at",
+                "service__name", "service__duration_minutes",
+                "slot__start_at",
+            )
+            .order_by("slot__start_at")
+            .iterator(chunk_size=500)
+        )
+
+    @staticmethod
+    def _render(kind: str, value) -> Iterator[str]:
+        yield (
+            _ics_line("BEGIN:VCALENDAR")
+            + _ics_line("VERSION:2.0")
+            + _ics_line("PRODID:-//AgendaLite//Agenda//ES")
+            + _ics_line("CALSCALE:GREGORIAN")
+            + _ics_line("METHOD:PUBLISH")
+        )
+
+        for booking in CalendarFeedService._bookings(kind, value):
+            start_at = booking.slot.start_at
+            end_at = start_at + timedelta(minutes=booking.service.duration_minutes)
+
+            if kind == KIND_SERVICE:
+                summary = f"{booking.customer_name} - {booking.service.name}"
+            else:
+                summary = booking.service.name
+
+            status = "CONFIRMED" if booking.status == Booking.Status.CONFIRMED else "CANCELLED"
+
+            yield (
+                _ics_line("BEGIN:VEVENT")
+                + _ics_line(f"UID:booking-{booking.id}@agendalite")
+                + _ics_line(f"DTSTAMP:{_ics_datetime(booking.created_at)}")
+                + _ics_line(f"DTSTART:{_ics_datetime(start_at)}")
+                + _ics_line(f"DTEND:{_ics_datetime(end_at)}")
+                + _ics_line(f"SUMMARY:{_ics_escape(summary)}")
+                + _ics_line(f"STATUS:{status}")
+                + _ics_line("END:VEVENT")
+            )
+
+        yield _ics_line("END:VCALENDAR")
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.appointments.models import IdempotencyKey
+
+
+# Cuánto se recuerda una clave (los reintentos de un cliente móvil llegan en minutos)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+SCOPE_BOOKING_CREATE = "booking_create"
+
+
+class InvalidIdempotencyKeyError(Exception):
+    pass
+
+
+class IdempotencyKeyMismatchError(Exception):
+    pass
+
+
+class IdempotencyService:
+    """
+    Claves de idempotencia guardadas en su propia tabla (compartida entre workers).
+
+    claim() inserta la clave dentro de la transacción del llamador. Un
+    duplicado concurrente choca con la restricción única: en PostgreSQL su
+    INSERT espera a que la primera transacción termine (y en SQLite la
+    transacción IMMEDIATE espera el lock), así que ambos terminan en una
+    sola ejecución y el segundo recibe el resultado del primero.
+    """
+
+    @staticmethod
+    def normalize_key(raw: str | None) -> str | None:
+        key = (raw or "").strip()
+        if not key:
+            return None
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise InvalidIdempotencyKeyError("La clave de idempotencia es demasiado larga.")
+        return key
+
+    @staticmethod
+    def fingerprint(**data) -> str:
+        payload = "|".join(f"{k}={str(data[k]).strip().lower()}" for k in sorted(data))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def booking_fingerprint(*, customer_email: str, slot_id: int | None = None, service_id: int | None = None, start_at=None) -> str:
+        """
+        Huella de una reserva: por slot existente o por (servicio, horario)
+        en el caso de horarios virtuales (modo RULES).
+        """
+        if slot_id is not None:
+            return IdempotencyService.fingerprint(slot_id=slot_id, customer_email=customer_email)
+        return IdempotencyService.fingerprint(
+            service_id=service_id, start_at=start_at.isoformat(), customer_email=customer_email
+        )
+
+    @staticmethod
+    def completed_booking_id(*, scope: str, key: str, fingerprint: str) -> int | None:
+        """
+        Camino rápido para reintentos: una consulta a la tabla de claves,
+        sin tocar TimeSlot ni abrir transacción.
+        """
+        row = (
+            IdempotencyKey.objects
+            .filter(scope=scope, key=key, expires_at__gt=timezone.now())
+            .values_list("booking_id", "fingerprint")
+            .first()
+        )
+        if row is None:
+            return None
+
+        booking_id, stored_fingerprint = row
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyKeyMismatchError("Esta clave de idempotencia ya se usó con otros datos.")
+        return booking_id
+
+    @staticmethod
+    def claim(*, scope: str, key: str, fingerprint: str) -> tuple[IdempotencyKey, bool]:
+        """
+        Devuelve (registro, creado). Si creado es False, la operación ya se
+        ejecutó y el registro trae su resultado. Debe llamarse dentro de una transacción.
+        """
+        now = timezone.now()
+        IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__lte=now).delete()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    scope=scope,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + IDEMPOTENCY_KEY_TTL,
+                )
+            return record, True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.select_related("booking__slot").get(scope=scope, key=key)
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatchError("Esta clave de idempotencia ya se usó con otros datos.")
+        return record, False
+
+    @staticmethod
+    def purge_expired() -> int:
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
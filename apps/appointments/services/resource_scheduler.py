@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable
+
+from django.db import IntegrityError, connection, transaction
+
+from apps.appointments.models import Booking, Resource, ResourceAllocation
+
+
+# Nombre de la restricción de exclusión (solo PostgreSQL, ver migración 0003)
+EXCLUSION_CONSTRAINT = "alloc_no_overlap_per_resource"
+
+
+class ResourceConflictError(Exception):
+    pass
+
+
+class ResourceScheduler:
+    """
+    Chequeo y registro de ocupación de recursos (profesionales/salas).
+
+    Las asignaciones de un mismo recurso nunca se solapan, así que ordenadas
+    por start_at también quedan ordenadas por end_at. Para saber si
+    [start_at, end_at) choca con algo basta con mirar la última asignación
+    que empieza antes de end_at: si termina después de start_at, hay solape.
+    Esa búsqueda es O(log n) sobre el índice (resource, start_at).
+    """
+
+    @staticmethod
+    def find_conflict(*, resource_id: int, start_at: datetime, end_at: datetime) -> ResourceAllocation | None:
+        previous = (
+            ResourceAllocation.objects
+            .filter(resource_id=resource_id, start_at__lt=end_at)
+            .order_by("-start_at")
+            .only("id", "resource_id", "booking_id", "start_at", "end_at")
+            .first()
+        )
+        if previous is not None and previous.end_at > start_at:
+            return previous
+        return None
+
+    @staticmethod
+    def allocate(*, booking: Booking, resource_ids: Iterable[int], start_at: datetime, end_at: datetime) -> list[ResourceAllocation]:
+        """
+        Reserva los recursos para la reserva dada. Debe llamarse dentro de
+        la transacción de BookingService.create_booking.
+        """
+        resource_ids = sorted(resource_ids)
+        if not resource_ids:
+            return []
+
+        # Bloqueamos los recursos en orden fijo: serializa reservas que compiten
+        # por el mismo recurso (en SQLite la transacción ya es exclusiva al escribir).
+        locked = Resource.objects.select_for_update().filter(id__in=resource_ids).order_by("id")
+        # Un profesional/sala dado de baja no se asigna: el servicio no se puede prestar
+        if not all(is_active for _, is_active in locked.values_list("id", "is_active")):
+            raise ResourceConflictError("Un recurso de este servicio no está disponible.")
+
+        for resource_id in resource_ids:
+            if ResourceScheduler.find_conflict(resource_id=resource_id, start_at=start_at, end_at=end_at):
+                raise ResourceConflictError("Un recurso de este servicio ya está ocupado en ese horario.")
+
+        allocations = [
+            ResourceAllocation(booking=booking, resource_id=resource_id, start_at=start_at, end_at=end_at)
+            for resource_id in resource_ids
+        ]
+
+        try:
+            # Savepoint: si la restricción de PostgreSQL salta, la transacción
+            # exterior sigue usable y el error llega como ResourceConflictError.
+            with transaction.atomic():
+                ResourceAllocation.objects.bulk_create(allocations)
+        except IntegrityError as e:
+            if connection.vendor == "postgresql" and EXCLUSION_CONSTRAINT in str(e):
+                raise ResourceConflictError("Un recurso de este servicio ya está ocupado en ese horario.") from e
+            raise
+
+        return allocations
+
+    @staticmethod
+    def release(*, booking: Booking) -> None:
+        ResourceAllocation.objects.filter(booking=booking).delete()
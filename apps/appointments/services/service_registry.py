@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from apps.appointments.models import Service
+
+
+# Versión compartida entre workers (requiere una caché compartida: check appointments.E001)
+VERSION_KEY = "appointments:service_registry:version"
+
+# Fuera de un request (comandos, hilos) revisamos la versión cada tanto
+MAX_STALE_SECONDS = 5.0
+
+# Red de seguridad: si un cambio no llega por la versión, se recarga igual
+MAX_SNAPSHOT_AGE = 60 * 5
+
+
+class ServiceSnapshot:
+    """
+    Copia inmutable de un Service para lecturas sin BD.
+    Expone lo que usan reservas, formularios, vistas y templates.
+    """
+    __slots__ = ("id", "name", "duration_minutes", "is_active", "availability_mode", "resource_ids")
+
+    def __init__(self, *, id: int, name: str, duration_minutes: int, is_active: bool, availability_mode: str, resource_ids: tuple[int, ...]):
+        for attr, value in (
+            ("id", id),
+            ("name", name),
+            ("duration_minutes", duration_minutes),
+            ("is_active", is_active),
+            ("availability_mode", availability_mode),
+            ("resource_ids", resource_ids),
+        ):
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ServiceSnapshot es inmutable")
+
+    @classmethod
+    def from_model(cls, service: Service, resource_ids: tuple[int, ...]) -> ServiceSnapshot:
+        return cls(
+            id=service.id,
+            name=service.name,
+            duration_minutes=service.duration_minutes,
+            is_active=service.is_active,
+            availability_mode=service.availability_mode,
+            resource_ids=resource_ids,
+        )
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    def can_be_booked(self) -> bool:
+        return self.is_active
+
+    def duration(self) -> timedelta:
+        return timedelta(minutes=self.duration_minutes)
+
+    def uses_rules(self) -> bool:
+        return self.availability_mode == Service.AvailabilityMode.RULES
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.duration_minutes} min)"
+
+
+class ServiceRegistry:
+    """
+    Registro de servicios por proceso.
+
+    Los Service casi nunca cambian: se cargan todos de una vez (2 consultas)
+    y se sirven como ServiceSnapshot. Al guardar/borrar un Service, la señal
+    post_save/post_delete cambia la versión en la caché compartida; cada
+    worker la compara una vez por request (request_started) y recarga si cambió.
+    """
+    _lock = threading.Lock()
+    _snapshots: dict[int, ServiceSnapshot] | None = None
+    _version = None
+    _checked_at = 0.0
+    _loaded_at = 0.0
+    _needs_check = True
+    _bypass = False
+
+    # --- Lecturas ---
+
+    @classmethod
+    def get(cls, service_id: int) -> ServiceSnapshot:
+        if cls._bypass:
+            return cls._load_one(service_id)
+
+        snapshots = cls._fresh()
+        snapshot = snapshots.get(int(service_id))
+        if snapshot is None:
+            # Creado en otro worker y aún sin ver la versión nueva
+            snapshot = cls._load_one(service_id)
+            with cls._lock:
+                if cls._snapshots is not None:
+                    cls._snapshots[snapshot.id] = snapshot
+        return snapshot
+
+    @classmethod
+    def active(cls) -> list[ServiceSnapshot]:
+        if cls._bypass:
+            return [cls._snapshot(s) for s in cls._queryset().filter(is_active=True).order_by("name")]
+        return sorted((s for s in cls._fresh().values() if s.is_active), key=lambda s: s.name)
+
+    # --- Invalidación ---
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Marca el registro como viejo en todos los workers (y en este, de inmediato).
+        Se llama desde las señales de Service tras el commit.
+        """
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        with cls._lock:
+            cls._snapshots = None
+            cls._needs_check = True
+
+    @classmethod
+    def mark_request_started(cls, **kwargs) -> None:
+        cls._needs_check = True
+
+    @classmethod
+    @contextmanager
+    def bypassed(cls):
+        """
+        Desactiva el registro (cada get() va a la BD). Útil para comparar en benchmarks.
+        """
+        previous = cls._bypass
+        cls._bypass = True
+        try:
+            yield
+        finally:
+            cls._bypass = previous
+
+    # --- Carga ---
+
+    @classmethod
+    def _fresh(cls) -> dict[int, ServiceSnapshot]:
+        now = time.monotonic()
+        if cls._snapshots is not None and not cls._needs_check and now - cls._checked_at < MAX_STALE_SECONDS:
+            return cls._snapshots
+
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)
+
+        with cls._lock:
+            if cls._snapshots is None or version != cls._version or now - cls._loaded_at > MAX_SNAPSHOT_AGE:
+                cls._snapshots = cls._load_all()
+                cls._version = version
+                cls._loaded_at = now
+            cls._checked_at = now
+            cls._needs_check = False
+            return cls._snapshots
+
+    @staticmethod
+    def _queryset():
+        # Siempre de la primaria: con la versión recién cambiada, una réplica
+        # atrasada dejaría datos viejos en caché hasta el próximo cambio
+        return Service.objects.using(DEFAULT_DB_ALIAS).prefetch_related("resources")
+
+    @staticmethod
+    def _snapshot(service: Service) -> ServiceSnapshot:
+        resource_ids = tuple(sorted(r.id for r in service.resources.all()))
+        return ServiceSnapshot.from_model(service, resource_ids)
+
+    @classmethod
+    def _load_all(cls) -> dict[int, ServiceSnapshot]:
+        return {service.id: cls._snapshot(service) for service in cls._queryset()}
+
+    @classmethod
+    def _load_one(cls, service_id: int) -> ServiceSnapshot:
+        return cls._snapshot(cls._queryset().get(id=service_id))
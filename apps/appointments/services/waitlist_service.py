@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from django.db import IntegrityError, transaction
+
+from apps.appointments.models import TimeSlot, WaitlistEntry
+from apps.appointments.services.service_registry import ServiceRegistry
+
+
+class WaitlistNotAllowedError(Exception):
+    pass
+
+
+class WaitlistService:
+    """
+    Lista de espera por slot (servicio + horario).
+    La promoción a reserva la hace BookingService.cancel_booking usando pop_head().
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def join(*, slot_id: int, customer_name: str, customer_email: str) -> WaitlistEntry:
+        slot = TimeSlot.objects.get(id=slot_id)
+
+        if not ServiceRegistry.get(slot.service_id).can_be_booked():
+            raise WaitlistNotAllowedError("Este servicio no está disponible.")
+
+        if not slot.is_in_future():
+            raise WaitlistNotAllowedError("Este slot ya pasó.")
+
+        if slot.status == TimeSlot.Status.AVAILABLE:
+            raise WaitlistNotAllowedError("Este slot está disponible, puedes reservarlo directamente.")
+
+        # Solo se promueve al cancelar una reserva: un slot BLOCKED (o BOOKED sin
+        # reserva confirmada, ver migración 0007) nunca liberaría la cola
+        if slot.status != TimeSlot.Status.BOOKED or not slot.has_confirmed_booking():
+            raise WaitlistNotAllowedError("Este slot no admite lista de espera.")
+
+        try:
+            with transaction.atomic():
+                return WaitlistEntry.objects.create(
+                    slot=slot,
+                    customer_name=customer_name,
+                    customer_email=customer_email.strip().lower(),
+                )
+        except IntegrityError:
+            raise WaitlistNotAllowedError("Ya estás en la lista de espera de este slot.")
+
+    @staticmethod
+    def pop_head(*, slot_id: int) -> WaitlistEntry | None:
+        """
+        Saca la cabeza de la cola del slot con un único SELECT ... FOR UPDATE
+        sobre el índice de la cola (en SQLite el lock lo da la transacción).
+        Debe llamarse dentro de una transacción; el llamador marca la entrada
+        como PROMOTED (o la deja en espera si no pudo promoverla).
+        """
+        return WaitlistEntry.objects.queue_for(slot_id).select_for_update().first()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.appointments.models import Service
+from apps.appointments.services.service_registry import ServiceRegistry
+
+
+# Nota: bulk_create/update() no disparan señales. Un id nuevo se carga igual
+# en el primer get(), pero quien modifique servicios existentes así debe
+# llamar a ServiceRegistry.invalidate().
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_registry(sender, **kwargs):
+    # Tras el commit: antes, otro worker podría recargar los datos viejos
+    transaction.on_commit(ServiceRegistry.invalidate)
+
+
+@receiver(m2m_changed, sender=Service.resources.through)
+def invalidate_service_registry_resources(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(ServiceRegistry.invalidate)
+
+
+# La versión compartida se revisa una vez por request
+request_started.connect(ServiceRegistry.mark_request_started, dispatch_uid="service_registry_request_started")
@@ -1,3 +1,607 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import warnings
+from datetime import datetime, time, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.appointments.checks import check_shared_cache
+from apps.appointments.db_routing import PIN_COOKIE_NAME, REPLICA_DB_ALIAS, _RequestRouting, _routing
+from apps.appointments.models import (
+    AvailabilityException,
+    AvailabilityRule,
+    Booking,
+    IdempotencyKey,
+    Resource,
+    ResourceAllocation,
+    Service,
+    TimeSlot,
+    WaitlistEntry,
+)
+from apps.appointments.services.availability import AvailabilityService
+from apps.appointments.services.booking_service import (
+    BookingService,
+    ServiceNotBookableError,
+    SlotNotAvailableError,
+)
+from apps.appointments.services.calendar_feed import CalendarFeedService
+from apps.appointments.services.service_registry import VERSION_KEY, ServiceRegistry
+from apps.appointments.services.waitlist_service import WaitlistNotAllowedError, WaitlistService
+
+
+class AppointmentsTestCase(TestCase):
+    """
+    Base común: los TestCase no confirman transacciones, así que las señales
+    on_commit no corren. Limpiamos caché y registro de servicios en cada test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        ServiceRegistry.invalidate()
+
+    def make_service(self, name: str = "Corte", **kwargs) -> Service:
+        return Service.objects.create(name=name, duration_minutes=kwargs.pop("duration_minutes", 30), **kwargs)
+
+    def make_slot(self, service: Service, *, hours: int = 24, minutes: int = 0, **kwargs) -> TimeSlot:
+        start_at = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=hours, minutes=minutes)
+        return TimeSlot.objects.create(service=service, start_at=start_at, **kwargs)
+
+    def book(self, slot: TimeSlot, email: str = "ana@example.com") -> Booking:
+        return BookingService.create_booking(
+            service_id=slot.service_id,
+            slot_id=slot.id,
+            customer_name="Ana",
+            customer_email=email,
+        ).booking
+
+
+class AdminChangeListQueryBudgetTests(AppointmentsTestCase):
+    """
+    Los changelists de slots y reservas hacen un número fijo de consultas,
+    sin importar cuántos servicios o filas haya.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+
+    def seed(self, *, services: int, slots_per_service: int) -> Service:
+        created = [self.make_service(f"s{services}-{i}") for i in range(services)]
+        for i, service in enumerate(created):
+            for j in range(slots_per_service):
+                slot = self.make_slot(service, hours=24 * (j + 1) + i)
+                Booking.objects.create(
+                    service=service, slot=slot, customer_name="x", customer_email="x@example.com"
+                )
+        return created[0]
+
+    def assert_budget(self, url: str, expected: int) -> None:
+        self.client.get(url)  # sesión y registro ya cargados
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def check_budgets(self, service: Service) -> None:
+        year = timezone.now().year
+        cases = [
+            ("/admin/appointments/timeslot/", 6),
+            (f"/admin/appointments/timeslot/?service={service.id}", 7),
+            (f"/admin/appointments/timeslot/?start_at__year={year}", 5),
+            ("/admin/appointments/booking/", 6),
+            (f"/admin/appointments/booking/?service={service.id}", 7),
+            (f"/admin/appointments/booking/?slot__start_at__year={year}", 5),
+        ]
+        for url, expected in cases:
+            with self.subTest(url=url):
+                self.assert_budget(url, expected)
+
+    def test_budget_with_few_rows(self):
+        self.check_budgets(self.seed(services=2, slots_per_service=2))
+
+    def test_budget_with_many_rows(self):
+        self.check_budgets(self.seed(services=40, slots_per_service=10))
+
+    def test_filtered_count_is_capped(self):
+        self.seed(services=2, slots_per_service=3)
+
+        with patch("apps.appointments.admin.FILTERED_COUNT_CAP", 4):
+            response = self.client.get("/admin/appointments/timeslot/?status=AVAILABLE")
+
+        self.assertEqual(response.context["cl"].result_count, 4)
+
+
+class CalendarFeedTests(AppointmentsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = self.make_service()
+        self.url = reverse(
+            "appointments:service_calendar_feed",
+            kwargs={"token": CalendarFeedService.token_for_service(self.service.id)},
+        )
+
+    def test_if_modified_since_sees_changes_within_the_same_second(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+
+        CalendarFeedService.invalidate(service_id=self.service.id, customer_email="a@example.com")
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 200)
+
+        CalendarFeedService.invalidate(service_id=self.service.id, customer_email="a@example.com")
+        second = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(second.status_code, 200)
+
+        unchanged = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=second["Last-Modified"])
+        self.assertEqual(unchanged.status_code, 304)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_feed_works_when_cache_does_not_keep_versions(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response.headers)
+
+    @override_settings(
+        REQUIRE_SHARED_CACHE=True,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_check_rejects_process_local_cache(self):
+        self.assertEqual([e.id for e in check_shared_cache(None)], ["appointments.E001"])
+
+    @override_settings(
+        REQUIRE_SHARED_CACHE=True,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}},
+    )
+    def test_check_accepts_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class ResourceConflictTests(AppointmentsTestCase):
+    """
+    Dos servicios de 30 min que comparten profesional no pueden solaparse.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.resource = Resource.objects.create(name="Laura")
+        self.haircut = self.make_service("Corte")
+        self.color = self.make_service("Color")
+        self.haircut.resources.add(self.resource)
+        self.color.resources.add(self.resource)
+
+    def test_overlapping_booking_on_shared_resource_is_rejected(self):
+        self.book(self.make_slot(self.haircut))
+        overlapping = self.make_slot(self.color, minutes=15)
+
+        with self.assertRaises(SlotNotAvailableError):
+            self.book(overlapping, email="bea@example.com")
+
+        overlapping.refresh_from_db()
+        self.assertEqual(overlapping.status, TimeSlot.Status.AVAILABLE)
+        self.assertFalse(Booking.objects.filter(slot=overlapping).exists())
+
+    def test_cancel_releases_the_resource(self):
+        booking = self.book(self.make_slot(self.haircut))
+        overlapping = self.make_slot(self.color, minutes=15)
+
+        BookingService.cancel_booking(booking_id=booking.id)
+        self.assertFalse(ResourceAllocation.objects.filter(booking=booking).exists())
+
+        self.book(overlapping, email="bea@example.com")
+        self.assertEqual(ResourceAllocation.objects.filter(resource=self.resource).count(), 1)
+
+    def test_inactive_resource_is_not_allocated(self):
+        Resource.objects.filter(id=self.resource.id).update(is_active=False)
+        slot = self.make_slot(self.haircut)
+
+        with self.assertRaises(SlotNotAvailableError):
+            self.book(slot)
+
+        slot.refresh_from_db()
+        self.assertEqual(slot.status, TimeSlot.Status.AVAILABLE)
+        self.assertFalse(ResourceAllocation.objects.exists())
+
+    def test_back_to_back_bookings_are_allowed(self):
+        self.book(self.make_slot(self.haircut))
+        # [10:00, 10:30) y [10:30, 11:00) no se solapan
+        self.book(self.make_slot(self.color, minutes=30), email="bea@example.com")
+
+        self.assertEqual(ResourceAllocation.objects.filter(resource=self.resource).count(), 2)
+
+
+class WaitlistTests(AppointmentsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = self.make_service()
+        self.slot = self.make_slot(self.service)
+        self.holder = self.book(self.slot, email="holder@example.com")
+
+    def join(self, email: str, slot: TimeSlot | None = None) -> WaitlistEntry:
+        return WaitlistService.join(slot_id=(slot or self.slot).id, customer_name="Espera", customer_email=email)
+
+    def confirmed_email(self) -> str:
+        return Booking.objects.get(slot=self.slot, status=Booking.Status.CONFIRMED).customer_email
+
+    def test_cancel_promotes_queue_in_fifo_order(self):
+        first, second, third = (self.join(f"{n}@example.com") for n in ("uno", "dos", "tres"))
+
+        BookingService.cancel_booking(booking_id=self.holder.id)
+        self.assertEqual(self.confirmed_email(), "uno@example.com")
+
+        promoted = Booking.objects.get(slot=self.slot, status=Booking.Status.CONFIRMED)
+        BookingService.cancel_booking(booking_id=promoted.id)
+        self.assertEqual(self.confirmed_email(), "dos@example.com")
+
+        statuses = {
+            e.customer_email: e.status for e in WaitlistEntry.objects.filter(id__in=[first.id, second.id, third.id])
+        }
+        self.assertEqual(
+            statuses,
+            {
+                "uno@example.com": WaitlistEntry.Status.PROMOTED,
+                "dos@example.com": WaitlistEntry.Status.PROMOTED,
+                "tres@example.com": WaitlistEntry.Status.WAITING,
+            },
+        )
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, TimeSlot.Status.BOOKED)
+
+    def test_cancel_with_empty_queue_frees_the_slot(self):
+        BookingService.cancel_booking(booking_id=self.holder.id)
+
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, TimeSlot.Status.AVAILABLE)
+        self.assertFalse(Booking.objects.filter(slot=self.slot, status=Booking.Status.CONFIRMED).exists())
+
+    def test_only_one_confirmed_booking_per_slot(self):
+        Booking.objects.create(
+            service=self.service, slot=self.slot, customer_name="x", customer_email="old@example.com",
+            status=Booking.Status.CANCELED,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.create(
+                service=self.service, slot=self.slot, customer_name="x", customer_email="dup@example.com"
+            )
+
+    def test_blocked_slot_rejects_waitlist(self):
+        blocked = self.make_slot(self.service, hours=48, status=TimeSlot.Status.BLOCKED)
+
+        with self.assertRaises(WaitlistNotAllowedError):
+            self.join("uno@example.com", slot=blocked)
+
+        response = self.client.post(
+            reverse("appointments:waitlist_join", kwargs={"slot_id": blocked.id}),
+            {"customer_name": "Uno", "customer_email": "uno@example.com"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WaitlistEntry.objects.filter(slot=blocked).exists())
+
+    def test_booked_slot_without_confirmed_booking_rejects_waitlist(self):
+        # Estado heredado de antes de 0004: reserva cancelada y slot aún BOOKED
+        Booking.objects.filter(id=self.holder.id).update(status=Booking.Status.CANCELED)
+
+        with self.assertRaises(WaitlistNotAllowedError):
+            self.join("uno@example.com")
+
+        response = self.client.post(
+            reverse("appointments:waitlist_join", kwargs={"slot_id": self.slot.id}),
+            {"customer_name": "Uno", "customer_email": "uno@example.com"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WaitlistEntry.objects.filter(slot=self.slot).exists())
+
+
+class IdempotentBookingTests(AppointmentsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = self.make_service()
+        self.slot = self.make_slot(self.service)
+        self.url = reverse("appointments:booking_create", kwargs={"slot_id": self.slot.id})
+        self.data = {"customer_name": "Ana", "customer_email": "ana@example.com", "idempotency_key": "k-1"}
+
+    def test_replayed_post_returns_original_booking_without_loading_the_slot(self):
+        first = self.client.post(self.url, self.data)
+        booking = Booking.objects.get(slot=self.slot)
+        self.assertRedirects(
+            first, reverse("appointments:booking_success", kwargs={"booking_id": booking.id}),
+            fetch_redirect_response=False,
+        )
+
+        # Solo la búsqueda de la clave: ni TimeSlot ni Service
+        with self.assertNumQueries(1):
+            replay = self.client.post(self.url, self.data)
+
+        self.assertEqual(replay.status_code, 302)
+        self.assertEqual(replay["Location"], first["Location"])
+        self.assertEqual(Booking.objects.filter(slot=self.slot).count(), 1)
+
+    def test_same_key_with_different_payload_is_rejected(self):
+        self.client.post(self.url, self.data)
+
+        response = self.client.post(self.url, {**self.data, "customer_email": "otra@example.com"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.filter(slot=self.slot).count(), 1)
+
+    def test_failed_attempt_does_not_keep_the_key(self):
+        self.slot.mark_booked()
+        self.slot.save(update_fields=["status"])
+
+        with self.assertRaises(SlotNotAvailableError):
+            BookingService.create_booking_idempotent(
+                idempotency_key="k-1",
+                service_id=self.service.id,
+                slot_id=self.slot.id,
+                customer_name="Ana",
+                customer_email="ana@example.com",
+            )
+        self.assertFalse(IdempotencyKey.objects.filter(key="k-1").exists())
+
+        # Con el slot libre, el reintento con la misma clave reserva normalmente
+        self.slot.mark_available()
+        self.slot.save(update_fields=["status"])
+        result = BookingService.create_booking_idempotent(
+            idempotency_key="k-1",
+            service_id=self.service.id,
+            slot_id=self.slot.id,
+            customer_name="Ana",
+            customer_email="ana@example.com",
+        )
+        self.assertFalse(result.replayed)
+        self.assertEqual(IdempotencyKey.objects.get(key="k-1").booking, result.booking)
+
+
+class RuleAvailabilityTests(AppointmentsTestCase):
+    """
+    Servicio en modo RULES: horarios de 1 h calculados desde reglas de los lunes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.service = self.make_service(
+            "Masaje", duration_minutes=60, availability_mode=Service.AvailabilityMode.RULES
+        )
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+
+    def at(self, day, hour: int, minute: int = 0) -> datetime:
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def add_rule(self, **kwargs) -> AvailabilityRule:
+        return AvailabilityRule.objects.create(
+            service=self.service,
+            weekday=AvailabilityRule.Weekday.MONDAY,
+            start_time=time(9),
+            end_time=time(12),
+            **kwargs,
+        )
+
+    def free_slots(self, weeks: int = 1) -> list[datetime]:
+        return list(
+            AvailabilityService.iter_free_slots(self.service, start=self.at(self.monday, 0), days=7 * weeks)
+        )
+
+    def test_rules_expand_only_within_validity_range(self):
+        second, third = self.monday + timedelta(days=7), self.monday + timedelta(days=14)
+        self.add_rule(valid_from=second, valid_until=third)
+
+        self.assertEqual(
+            self.free_slots(weeks=4),
+            [self.at(day, hour) for day in (second, third) for hour in (9, 10, 11)],
+        )
+
+    def test_exceptions_mask_overlapping_slots(self):
+        self.add_rule()
+        AvailabilityException.objects.create(
+            service=self.service, starts_at=self.at(self.monday, 10, 30), ends_at=self.at(self.monday, 11)
+        )
+
+        self.assertEqual(self.free_slots(), [self.at(self.monday, 9), self.at(self.monday, 11)])
+        self.assertFalse(AvailabilityService.is_offered(self.service, self.at(self.monday, 10)))
+
+    def test_taken_slots_are_excluded(self):
+        self.add_rule()
+        TimeSlot.objects.create(service=self.service, start_at=self.at(self.monday, 9), status=TimeSlot.Status.BOOKED)
+        # Una fila AVAILABLE (p. ej. tras cancelar) se sigue ofreciendo
+        TimeSlot.objects.create(service=self.service, start_at=self.at(self.monday, 10))
+
+        self.assertEqual(self.free_slots(), [self.at(self.monday, 10), self.at(self.monday, 11)])
+
+    def test_off_grid_start_is_not_offered(self):
+        self.add_rule()
+
+        self.assertTrue(AvailabilityService.is_offered(self.service, self.at(self.monday, 9)))
+        self.assertFalse(AvailabilityService.is_offered(self.service, self.at(self.monday, 9, 30)))
+        self.assertFalse(AvailabilityService.is_offered(self.service, self.at(self.monday, 12)))
+
+    def test_second_claim_of_same_start_fails_without_duplicate_slot(self):
+        self.add_rule()
+        start_at = self.at(self.monday, 9)
+        kwargs = {"service_id": self.service.id, "customer_name": "Ana", "start_at": start_at}
+
+        result = BookingService.create_booking(customer_email="ana@example.com", **kwargs)
+        self.assertEqual(result.slot.status, TimeSlot.Status.BOOKED)
+
+        with self.assertRaises(SlotNotAvailableError):
+            BookingService.create_booking(customer_email="bea@example.com", **kwargs)
+
+        self.assertEqual(TimeSlot.objects.filter(service=self.service, start_at=start_at).count(), 1)
+        self.assertEqual(Booking.objects.filter(service=self.service).count(), 1)
+        self.assertNotIn(start_at, self.free_slots())
+
+    def test_out_of_range_timestamp_is_404(self):
+        self.add_rule()
+        url = reverse(
+            "appointments:virtual_booking_create",
+            kwargs={"pk": self.service.id, "timestamp": 99999999999999},
+        )
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        # Con clave de idempotencia el POST calcula la huella antes de buscar el slot
+        response = self.client.post(
+            url, {"customer_name": "Ana", "customer_email": "ana@example.com", "idempotency_key": "k-1"}
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Booking.objects.exists())
+
+
+class ServiceRegistryTests(AppointmentsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = self.make_service()
+        self.slot = self.make_slot(self.service)
+
+    def test_snapshots_are_immutable(self):
+        snapshot = ServiceRegistry.get(self.service.id)
+
+        with self.assertRaises(AttributeError):
+            snapshot.is_active = False
+
+    def test_saving_a_service_stops_bookings_after_commit(self):
+        ServiceRegistry.get(self.service.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.is_active = False
+            self.service.save()
+
+        with self.assertRaises(ServiceNotBookableError):
+            self.book(self.slot)
+
+    def test_version_bump_from_another_worker_reloads_on_next_request(self):
+        ServiceRegistry.get(self.service.id)
+        # Otro worker desactivó el servicio y renovó la versión compartida
+        Service.objects.filter(id=self.service.id).update(is_active=False)
+        cache.set(VERSION_KEY, "otro-worker", timeout=None)
+
+        ServiceRegistry.mark_request_started()
+        self.assertFalse(ServiceRegistry.get(self.service.id).can_be_booked())
+
+    def test_booking_does_not_query_services(self):
+        ServiceRegistry.get(self.service.id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.book(self.slot)
+
+        table = Service._meta.db_table
+        self.assertEqual([q["sql"] for q in ctx.captured_queries if f'"{table}' in q["sql"]], [])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Router y middleware con dos alias. La "réplica" es otra conexión a la
+    misma base de test (como TEST MIRROR): los datos se ven igual y lo que
+    se comprueba es a qué conexión va cada consulta. TransactionTestCase
+    para que las lecturas no queden dentro de un atomic (que fuerza la primaria).
+
+    Sin REPLICA_DATABASE_URL el alias no existe al arrancar el runner (que
+    valida `databases` antes de todo), así que se agrega aquí y recién
+    entonces pasa a `databases` = {"default", "replica"}.
+    """
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.added_replica = REPLICA_DB_ALIAS not in connections.settings
+        if cls.added_replica:
+            connections.settings[REPLICA_DB_ALIAS] = {**connections.settings[DEFAULT_DB_ALIAS]}
+        cls.databases = {"default", REPLICA_DB_ALIAS}
+        with warnings.catch_warnings():
+            # Solo cambia lo que ve settings.DATABASES (replica_configured)
+            warnings.simplefilter("ignore")
+            cls.enterClassContext(override_settings(DATABASES=dict(connections.settings)))
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.added_replica:
+            connections[REPLICA_DB_ALIAS].close()
+            del connections[REPLICA_DB_ALIAS]
+            del connections.settings[REPLICA_DB_ALIAS]
+        cls.databases = {"default"}
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        ServiceRegistry.invalidate()
+        self.service = Service.objects.create(name="Corte", duration_minutes=30)
+        start_at = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.slot = TimeSlot.objects.create(service=self.service, start_at=start_at)
+        self.my_bookings = reverse("appointments:my_bookings") + "?email=ana@example.com"
+
+    def get(self, url: str, **kwargs):
+        """
+        GET capturando las consultas de cada alias que tocan appointments_*.
+        """
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+            response = self.client.get(url, **kwargs)
+
+        def tables(ctx):
+            return [q["sql"] for q in ctx.captured_queries if "appointments_" in q["sql"]]
+
+        return response, tables(primary), tables(replica)
+
+    def test_marked_view_reads_from_replica(self):
+        response, primary, replica = self.get(self.my_bookings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("appointments_booking" in sql for sql in replica))
+        self.assertFalse(any("appointments_booking" in sql for sql in primary))
+
+    def test_unmarked_view_reads_from_primary(self):
+        response, primary, replica = self.get(
+            reverse("appointments:booking_create", kwargs={"slot_id": self.slot.id})
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("appointments_timeslot" in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_atomic_blocks_and_writes_use_primary(self):
+        token = _routing.set(_RequestRouting(use_replica=True))
+        try:
+            self.assertEqual(router.db_for_read(Booking), REPLICA_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Booking), DEFAULT_DB_ALIAS)
+
+            self.assertEqual(router.db_for_write(Booking), DEFAULT_DB_ALIAS)
+            # Tras escribir, el resto del request lee de la primaria
+            self.assertEqual(router.db_for_read(Booking), DEFAULT_DB_ALIAS)
+        finally:
+            _routing.reset(token)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post(
+            reverse("appointments:booking_create", kwargs={"slot_id": self.slot.id}),
+            {"customer_name": "Ana", "customer_email": "ana@example.com"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        response, primary, replica = self.get(self.my_bookings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Corte")
+        self.assertTrue(any("appointments_booking" in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_malformed_pin_cookie_is_ignored(self):
+        self.client.cookies[PIN_COOKIE_NAME] = "no-es-un-numero"
+
+        response, primary, replica = self.get(self.my_bookings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("appointments_booking" in sql for sql in replica))
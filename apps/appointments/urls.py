@@ -9,8 +9,13 @@ urlpatterns = [
     path("services/", views.ServiceListView.as_view(), name="service_list"),
     path("services/<int:pk>/", views.ServiceDetailView.as_view(), name="service_detail"),
     path("book/<int:slot_id>/", views.BookingCreateView.as_view(), name="booking_create"),
+    path("services/<int:pk>/book/<int:timestamp>/", views.VirtualBookingCreateView.as_view(), name="virtual_booking_create"),
+    path("book/<int:slot_id>/waitlist/", views.WaitlistJoinView.as_view(), name="waitlist_join"),
     path("booking/<int:booking_id>/success/", views.BookingSuccessView.as_view(), name="booking_success"),
 
     path("my-bookings/", views.MyBookingsView.as_view(), name = "my_bookings"),
     path("booking/<int:booking_id>/cancel/", views.BookingCancelView.as_view(), name="booking_cancel"),
+
+    path("calendar/service/<str:token>.ics", views.ServiceCalendarFeedView.as_view(), name="service_calendar_feed"),
+    path("calendar/customer/<str:token>.ics", views.CustomerCalendarFeedView.as_view(), name="customer_calendar_feed"),
 ]
@@ -1,4 +1,7 @@
 from __future__ import annotations
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
 from typing import Any
 
 from django.db.models.query import QuerySet
@@ -6,19 +9,38 @@ from django.views import View
 from django.utils import timezone
 
 from django.contrib import messages
-from django.http import Http404
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import FormView
 
-from apps.appointments.forms import BookingRequestForm, MyBookingsFilterForm
+from apps.appointments.db_routing import ReplicaReadMixin
+from apps.appointments.forms import BookingRequestForm, MyBookingsFilterForm, WaitlistRequestForm
 from apps.appointments.models import Service, TimeSlot, Booking
 from apps.appointments.services.booking_service import (
     BookingService,
     SlotNotAvailableError,
     ServiceNotBookableError,
 )
+from apps.appointments.services.availability import AvailabilityService
+from apps.appointments.services.calendar_feed import (
+    FEED_MAX_AGE,
+    KIND_CUSTOMER,
+    KIND_SERVICE,
+    CalendarFeedService,
+    InvalidFeedTokenError,
+)
+from apps.appointments.services.service_registry import ServiceRegistry, ServiceSnapshot
+from apps.appointments.services.idempotency import (
+    SCOPE_BOOKING_CREATE,
+    IdempotencyKeyMismatchError,
+    IdempotencyService,
+    InvalidIdempotencyKeyError,
+)
+from apps.appointments.services.waitlist_service import WaitlistNotAllowedError, WaitlistService
 
 
 class HomeRedirectView(TemplateView):
@@ -31,7 +53,7 @@ class HomeRedirectView(TemplateView):
         return redirect("appointments:service_list")
 
 
-class ServiceListView(ListView):
+class ServiceListView(ReplicaReadMixin, ListView):
     """
     Lista de servicios activos.
     """
@@ -40,11 +62,11 @@ class ServiceListView(ListView):
     context_object_name = "services"
 
     def get_queryset(self):
-        # Consultas expresivas: lo que el usuario puede agendar
-        return Service.objects.filter(is_active=True).order_by("name")
+        # Lo que el usuario puede agendar, desde el registro en memoria (sin consultas)
+        return ServiceRegistry.active()
 
 
-class ServiceDetailView(DetailView):
+class ServiceDetailView(ReplicaReadMixin, DetailView):
     """
     Detalle del servicio + slots disponibles.
     """
@@ -52,16 +74,33 @@ class ServiceDetailView(DetailView):
     template_name = "appointments/service_detail.html"
     context_object_name = "service"
 
-    def get_queryset(self):
-        return Service.objects.filter(is_active=True)
+    def get_object(self, queryset=None) -> ServiceSnapshot:
+        try:
+            service = ServiceRegistry.get(self.kwargs["pk"])
+        except Service.DoesNotExist:
+            raise Http404("Servicio no encontrado")
+        if not service.is_active:
+            raise Http404("Servicio no encontrado")
+        return service
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         service = self.object
 
         # Mostramos próximos 20 slots disponibles
-        ctx["available_slots"] = (
-            TimeSlot.objects.for_service(service.id).available().select_related("service")[:20]
+        if service.uses_rules():
+            # Horarios virtuales: se calculan desde las reglas, sin filas en TimeSlot
+            ctx["available_slots"] = [
+                TimeSlot(service_id=service.id, start_at=start_at)
+                for start_at in islice(AvailabilityService.iter_free_slots(service), 20)
+            ]
+        else:
+            ctx["available_slots"] = (
+                TimeSlot.objects.for_service(service.id).available()[:20]
+            )
+        # Slots llenos: en vez de refrescar la página, el usuario se anota en la lista de espera
+        ctx["full_slots"] = (
+            TimeSlot.objects.for_service(service.id).future().filter(status=TimeSlot.Status.BOOKED)[:20]
         )
         return ctx
 
@@ -74,13 +113,54 @@ class BookingCreateView(FormView):
     template_name = "appointments/booking_form.html"
 
     def dispatch(self, request, *args, **kwargs):
+        if request.method == "POST":
+            try:
+                self.idempotency_key = IdempotencyService.normalize_key(
+                    request.headers.get("Idempotency-Key") or request.POST.get("idempotency_key")
+                )
+            except InvalidIdempotencyKeyError as e:
+                return HttpResponseBadRequest(str(e))
+
+            # Reintento de un envío que ya se completó: devolvemos el mismo
+            # resultado sin cargar el slot ni volver a validar el form
+            replay = self._replay()
+            if replay is not None:
+                return replay
+
         self.slot = self._get_slot()
         return super().dispatch(request, *args, **kwargs)
 
+    def _slot_kwargs(self) -> dict[str, Any]:
+        """
+        Cómo identifica esta vista el horario a reservar (ver VirtualBookingCreateView).
+        Solo usa los kwargs de la URL: se llama antes de cargar el slot.
+        """
+        return {"slot_id": self.kwargs.get("slot_id")}
+
+    def _fingerprint(self, customer_email: str) -> str:
+        return IdempotencyService.booking_fingerprint(customer_email=customer_email, **self._slot_kwargs())
+
+    def _replay(self):
+        if not self.idempotency_key:
+            return None
+
+        try:
+            booking_id = IdempotencyService.completed_booking_id(
+                scope=SCOPE_BOOKING_CREATE,
+                key=self.idempotency_key,
+                fingerprint=self._fingerprint(self.request.POST.get("customer_email", "")),
+            )
+        except IdempotencyKeyMismatchError as e:
+            return HttpResponseBadRequest(str(e))
+
+        if booking_id is None:
+            return None
+        return redirect("appointments:booking_success", booking_id=booking_id)
+
     def _get_slot(self) -> TimeSlot:
         slot_id = self.kwargs.get("slot_id")
         try:
-            return TimeSlot.objects.select_related("service").get(id=slot_id)
+            return TimeSlot.objects.get(id=slot_id)
         except TimeSlot.DoesNotExist:
             raise Http404("Slot no encontrado")
 
@@ -93,21 +173,122 @@ class BookingCreateView(FormView):
     def get_form_class(self):
         return BookingRequestForm
 
+    def form_invalid(self, form):
+        # Un duplicado concurrente puede ver el slot ya reservado por el envío
+        # original justo al validar: si ese envío terminó, devolvemos su resultado
+        replay = self._replay() if self.request.method == "POST" else None
+        if replay is not None:
+            return replay
+        return super().form_invalid(form)
+
+    def get_initial(self):
+        initial = super().get_initial()
+        initial["idempotency_key"] = uuid.uuid4().hex
+        return initial
+
     def form_valid(self, form):
         # Regla importante: el servicio es la fuente de verdad para reservar
+        booking_kwargs = {
+            "service_id": self.slot.service_id,
+            "customer_name": form.cleaned_data["customer_name"],
+            "customer_email": form.cleaned_data["customer_email"],
+            **self._slot_kwargs(),
+        }
         try:
-            result = BookingService.create_booking(
-                service_id=self.slot.service_id,
+            if self.idempotency_key:
+                result = BookingService.create_booking_idempotent(
+                    idempotency_key=self.idempotency_key, **booking_kwargs
+                )
+            else:
+                result = BookingService.create_booking(**booking_kwargs)
+        except (SlotNotAvailableError, ServiceNotBookableError, IdempotencyKeyMismatchError) as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
+
+        if result.replayed:
+            return redirect("appointments:booking_success", booking_id=result.booking.id)
+
+        messages.success(self.request, "Reserva creada correctamente.")
+        return redirect("appointments:booking_success", booking_id=result.booking.id)
+
+
+class VirtualBookingCreateView(BookingCreateView):
+    """
+    Reserva de un horario virtual (servicio en modo RULES).
+    URL: /services/<pk>/book/<timestamp>/. El TimeSlot no existe todavía:
+    BookingService.create_booking lo inserta al confirmar la reserva.
+    """
+
+    def _start_at(self) -> datetime:
+        # La URL acepta cualquier entero: fuera del rango de datetime es un 404
+        try:
+            return datetime.fromtimestamp(self.kwargs["timestamp"], tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise Http404("Horario no encontrado")
+
+    def _slot_kwargs(self) -> dict[str, Any]:
+        return {"service_id": self.kwargs["pk"], "start_at": self._start_at()}
+
+    def _get_slot(self) -> TimeSlot:
+        try:
+            service = ServiceRegistry.get(self.kwargs["pk"])
+        except Service.DoesNotExist:
+            raise Http404("Servicio no encontrado")
+        if not service.is_active:
+            raise Http404("Servicio no encontrado")
+
+        start_at = self._start_at()
+        if not AvailabilityService.is_offered(service, start_at):
+            raise Http404("Horario no encontrado")
+
+        # Si ya se materializó (p. ej. reserva cancelada) usamos esa fila;
+        # si no, un slot sin guardar basta para validar el form
+        slot = TimeSlot.objects.filter(service_id=service.id, start_at=start_at).first()
+        return slot or TimeSlot(service_id=service.id, start_at=start_at)
+
+
+class WaitlistJoinView(FormView):
+    """
+    Anotarse en la lista de espera de un slot lleno.
+    Si alguien cancela, BookingService convierte la cabeza de la cola en reserva.
+    """
+    template_name = "appointments/waitlist_form.html"
+    form_class = WaitlistRequestForm
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            self.slot = TimeSlot.objects.get(id=self.kwargs.get("slot_id"))
+        except TimeSlot.DoesNotExist:
+            raise Http404("Slot no encontrado")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["slot"] = self.slot
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["slot"] = self.slot
+        ctx["service"] = ServiceRegistry.get(self.slot.service_id)
+        return ctx
+
+    def form_valid(self, form):
+        try:
+            WaitlistService.join(
                 slot_id=self.slot.id,
                 customer_name=form.cleaned_data["customer_name"],
                 customer_email=form.cleaned_data["customer_email"],
             )
-        except (SlotNotAvailableError, ServiceNotBookableError) as e:
+        except WaitlistNotAllowedError as e:
             form.add_error(None, str(e))
             return self.form_invalid(form)
 
-        messages.success(self.request, "Reserva creada correctamente.")
-        return redirect("appointments:booking_success", booking_id=result.booking.id)
+        messages.success(
+            self.request,
+            "Estás en la lista de espera. Si se libera el horario, la reserva aparecerá en 'Mis reservas'.",
+        )
+        return redirect("appointments:service_detail", pk=self.slot.service_id)
 
 
 class BookingSuccessView(TemplateView):
@@ -117,7 +298,7 @@ class BookingSuccessView(TemplateView):
         return {"booking_id": kwargs["booking_id"]}
 
 
-class MyBookingsView(ListView):
+class MyBookingsView(ReplicaReadMixin, ListView):
     """
     /my-bookings/?email=...&status=...&date_from=...&date_to=...
     - Filtros validados por form
@@ -139,6 +320,7 @@ class MyBookingsView(ListView):
             return Booking.objects.none()
 
         email = form.cleaned_data["email"].strip().lower()
+        self.calendar_token = CalendarFeedService.token_for_customer(email)
         status = form.cleaned_data.get("status") or ""
         date_from = form.cleaned_data.get("date_from")
         date_to = form.cleaned_data.get("date_to")
@@ -165,6 +347,12 @@ class MyBookingsView(ListView):
         ctx = super().get_context_data(**kwargs)
         form = self.get_form()
         ctx["form"] = form
+
+        token = getattr(self, "calendar_token", None)
+        if token:
+            ctx["calendar_feed_url"] = self.request.build_absolute_uri(
+                reverse("appointments:customer_calendar_feed", kwargs={"token": token})
+            )
         return ctx
 
 class BookingCancelView(View):
@@ -190,3 +378,66 @@ class BookingCancelView(View):
         # Redirigimos de vuelta conservando el email para que el usuario vea su lista
         return redirect(f"{reverse('appointments:my_bookings')}?email={email}")
 
+
+
+class CalendarFeedView(View):
+    """
+    GET de un feed .ics (base para servicio/cliente).
+    - 304 si el cliente ya tiene la versión vigente (sin tocar la BD).
+    - Cuerpo desde caché si ya se generó para esa versión.
+    - Si no, se genera como stream y se cachea al terminar.
+    """
+    kind: str = ""
+    content_type = "text/calendar; charset=utf-8"
+
+    def get_feed_value(self, token: str):
+        raise NotImplementedError
+
+    def get(self, request, token: str):
+        try:
+            value = self.get_feed_value(token)
+        except InvalidFeedTokenError:
+            raise Http404("Calendario no encontrado")
+
+        version = CalendarFeedService.get_version(self.kind, value)
+        etag = CalendarFeedService.etag(self.kind, value, version)
+        last_modified = CalendarFeedService.last_modified(version)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            body = CalendarFeedService.cached_body(self.kind, value, version)
+            if body is not None:
+                response = HttpResponse(body, content_type=self.content_type)
+            else:
+                response = StreamingHttpResponse(
+                    CalendarFeedService.stream(self.kind, value, version),
+                    content_type=self.content_type,
+                )
+
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, max_age=FEED_MAX_AGE)
+        return response
+
+
+class ServiceCalendarFeedView(CalendarFeedView):
+    """
+    GET /calendar/service/<token>.ics
+    Agenda de reservas confirmadas de un servicio (para el staff).
+    """
+    kind = KIND_SERVICE
+
+    def get_feed_value(self, token: str) -> int:
+        return CalendarFeedService.service_id_from_token(token)
+
+
+class CustomerCalendarFeedView(CalendarFeedView):
+    """
+    GET /calendar/customer/<token>.ics
+    Reservas de un cliente. El token firmado reemplaza al correo en la URL.
+    """
+    kind = KIND_CUSTOMER
+
+    def get_feed_value(self, token: str) -> str:
+        return CalendarFeedService.customer_email_from_token(token)
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.appointments.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -81,9 +82,40 @@ DATABASES = {
     'default': {
            "ENGINE": "django.db.backends.sqlite3",
            "NAME": BASE_DIR / "db.sqlite3",
+           # BEGIN IMMEDIATE: las transacciones que escriben (reservas, cancelaciones)
+           # toman el lock al empezar y esperan en vez de fallar con "database is locked"
+           "OPTIONS": {"transaction_mode": "IMMEDIATE"},
     }
 }
 
+# Réplica de solo lectura (opcional). Para probar en local con dos SQLite:
+#   REPLICA_DATABASE_URL=sqlite:///db_replica.sqlite3
+#   python manage.py migrate --database=replica
+if env("REPLICA_DATABASE_URL", default=""):
+    DATABASES["replica"] = env.db("REPLICA_DATABASE_URL")
+    # En tests la réplica apunta a la misma base que default
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["apps.appointments.db_routing.PrimaryReplicaRouter"]
+
+# Segundos que un cliente lee de la primaria después de escribir
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+
+# Cache
+# Los feeds .ics guardan su versión y su cuerpo aquí. En producción debe ser
+# compartida entre workers (p. ej. CACHE_URL=redis://...); por defecto, memoria local.
+
+CACHES = {
+    # El límite por defecto de locmem (300 claves) no alcanza para un feed por cliente
+    "default": env.cache("CACHE_URL", default="locmemcache://agendalite?MAX_ENTRIES=100000"),
+}
+
+# Sin DEBUG, el check appointments.E001 exige una caché compartida (no locmem):
+# con varios workers, las versiones de los feeds y del registro de servicios
+# deben verse en todos.
+# Un despliegue de un solo proceso puede desactivarlo con REQUIRE_SHARED_CACHE=False.
+REQUIRE_SHARED_CACHE = env.bool("REQUIRE_SHARED_CACHE", default=not DEBUG)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators